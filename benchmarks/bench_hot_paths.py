@@ -0,0 +1,210 @@
+"""
+Offline benchmarks for the bot's hot paths, driven through the fakes in benchmarks/fakes.py.
+
+    python benchmarks/bench_hot_paths.py [--members 100000] [--roles 50] [--logs 200000]
+                                         [--blacklist 2000] [--iterations 2000]
+
+Each path reports ops/sec and p50/p99 latency; one-shot paths (channel backfill) report wall
+time and simulated REST calls. Runs against a throwaway copy of the database, never mod_logs.db.
+"""
+import argparse
+import asyncio
+import inspect
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db  # noqa: E402
+
+db.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="modbot-bench-"), "bench.db")
+
+import main  # noqa: E402  (safe: the bot only runs under __main__)
+import fakes  # noqa: E402
+
+# the throwaway database is seeded with the legacy guild's config on import
+CONFIG = main.LEGACY_GUILD_CONFIG
+
+async def measure(name: str, fn, iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        result = fn()
+        if inspect.isawaitable(result):
+            await result
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    total = sum(samples) / 1e9
+    return {
+        "name": name,
+        "ops": iterations / total if total else float("inf"),
+        "p50": samples[len(samples) // 2] / 1e3,
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] / 1e3,
+    }
+
+def print_results(results: list):
+    print(f"{'path':<44} {'ops/sec':>12} {'p50 (us)':>10} {'p99 (us)':>10}")
+    for r in results:
+        print(f"{r['name']:<44} {r['ops']:>12,.0f} {r['p50']:>10.1f} {r['p99']:>10.1f}")
+
+def seed_logs(guild_id: int, members: list, count: int, rng: random.Random):
+    moderators = members[:50]
+    base_ts = 1700000000
+    batch = []
+    for i in range(count):
+        meta = {
+            "user": rng.choice(members).id,
+            "moderator": rng.choice(moderators).id,
+            "action": rng.choice(["warn", "warn", "timeout", "kick", "ban"]),
+            "reason": "benchmark entry",
+            "timestamp": base_ts + i * 7,
+            "duration": None,
+        }
+        batch.append((meta, fakes.snowflake()))
+        if len(batch) >= 10000:
+            db.upsert_mod_logs(guild_id, batch)
+            batch = []
+    if batch:
+        db.upsert_mod_logs(guild_id, batch)
+
+async def bench_sync(guild, count: int) -> list:
+    channel = guild.get_channel(CONFIG.mod_log_channel_id)
+    members = guild.members
+    for i in range(count):
+        meta = main._new_modlog_meta(random.choice(members).id, members[0], "warn", "backfill", None)
+        message = fakes.FakeMessage(channel, main._make_modlog_content(meta))
+        channel.messages[message.id] = message
+    main.bot.get_channel = lambda cid: guild.get_channel(cid)
+    lines = []
+    for label in ("backfill", "catch-up (nothing new)"):
+        calls_before = guild._rest.calls.get("history", 0)
+        start = time.perf_counter()
+        await main.sync_mod_log_channel(guild)
+        lines.append(f"sync {label:<24} {time.perf_counter() - start:8.2f}s  {guild._rest.calls.get('history', 0) - calls_before} history pages")
+    return lines
+
+async def run(args):
+    rng = random.Random(7)
+    rest = fakes.FakeRest()
+    guild = fakes.build_guild(CONFIG.guild_id, args.members, args.roles, tier_role_ids=list(CONFIG.permission_tiers), rest=rest)
+    members = guild.members
+    log_channel = fakes.add_channel(guild, CONFIG.mod_log_channel_id, "mod-log")
+    blacklist_channel = fakes.add_channel(guild, CONFIG.blacklist_channel_id, "blacklist")
+    print(f"guild: {len(members):,} members, {len(guild.roles)} roles; seeding {args.logs:,} log rows...")
+    seed_logs(guild.id, members, args.logs, rng)
+
+    results = []
+
+    # check_permissions
+    def interaction_for_random_member():
+        return fakes.FakeInteraction(rng.choice(members), guild, log_channel, rest)
+
+    async def perm_warm():
+        await main.check_permissions(interaction_for_random_member(), "warn")
+
+    async def perm_cold():
+        main.invalidate_member_permissions()
+        await main.check_permissions(interaction_for_random_member(), "warn")
+
+    results.append(await measure("check_permissions (cold memo)", perm_cold, args.iterations))
+    for m in members[:args.iterations]:
+        main.resolve_member_permissions(m)
+    results.append(await measure("check_permissions (warm memo)", perm_warm, args.iterations))
+
+    # lazy member mode: role-set memo, LRU + batched query_members instead of the full cache
+    main.LAZY_MEMBERS = True
+    results.append(await measure("check_permissions (lazy, role-set memo)", perm_warm, args.iterations))
+    guild.cache_members = False
+    queries_before = rest.calls.get("query_members", 0)
+
+    async def resolve_bulk():
+        main.member_lru.discard(guild.id)
+        await main.member_cache.fetch_members(guild, [m.id for m in rng.sample(members, 250)], main.member_lru)
+
+    n = max(1, args.iterations // 10)
+    results.append(await measure("fetch_members (250 ids, cold LRU)", resolve_bulk, n))
+    queries = (rest.calls.get("query_members", 0) - queries_before) / n
+    guild.cache_members = True
+    main.LAZY_MEMBERS = False
+
+    # codec
+    meta = main._new_modlog_meta(members[0].id, members[1], "timeout", "spamming in general", 60)
+    meta["log_id"] = 123456
+    encoded = main._make_modlog_content(meta)
+    results.append(await measure("_make_modlog_content", lambda: main._make_modlog_content(meta), args.iterations * 10))
+    results.append(await measure("_extract_modlog_from_content (log)", lambda: main._extract_modlog_from_content(encoded), args.iterations * 10))
+    results.append(await measure("_extract_modlog_from_content (chat)", lambda: main._extract_modlog_from_content("just some regular chat message here"), args.iterations * 10))
+
+    # ModLogCursor / LogView
+    heavy = max(members[:2000], key=lambda m: db.count_mod_logs(guild.id, m.id, True))
+
+    async def page_random():
+        cursor = main.ModLogCursor(guild.id, rng.choice(members).id, only_warns=rng.random() < 0.5)
+        cursor.count()
+        await cursor.page(main.LogView.per_page)
+
+    async def page_heavy():
+        cursor = main.ModLogCursor(guild.id, heavy.id, only_warns=True)
+        cursor.count()
+        await cursor.page(main.LogView.per_page)
+
+    results.append(await measure("ModLogCursor count + page (random member)", page_random, args.iterations))
+    results.append(await measure(f"ModLogCursor count + page (heaviest, {db.count_mod_logs(guild.id, heavy.id, True)} warns)",
+                                 page_heavy, args.iterations))
+
+    view = main.LogView(main.ModLogCursor(guild.id, heavy.id, only_warns=True), heavy, fakes.FakeInteraction(members[0], guild, log_channel, rest))
+    await view._load_page(0)
+    results.append(await measure("LogView.get_page_embed", view.get_page_embed, args.iterations))
+
+    async def open_view():
+        v = main.LogView(main.ModLogCursor(guild.id, heavy.id, only_warns=True), heavy, fakes.FakeInteraction(members[0], guild, log_channel, rest))
+        await v._load_page(0)
+
+    results.append(await measure("LogView first page (count + page)", open_view, args.iterations))
+
+    # blacklist rendering
+    words = [f"term{i:05d}" for i in range(args.blacklist)]
+    for w in words:
+        db.insert_blacklist_item(guild.id, w)
+    blacklist = main.get_blacklist(guild.id)
+    blacklist.items[:] = sorted(words, key=str.lower)
+    blacklist.rebuild_matcher()
+    await main.update_blacklist_message(blacklist_channel)
+    counter = iter(range(10**9))
+
+    async def add_and_render():
+        main.add_blacklist_item(guild.id, f"zz-appended-{next(counter)}")
+        await main.update_blacklist_message(blacklist_channel)
+
+    edits_before = rest.calls.get("edit_message", 0) + rest.calls.get("send_message", 0)
+    n = max(1, args.iterations // 10)
+    results.append(await measure(f"update_blacklist_message ({args.blacklist} items, append)", add_and_render, n))
+    edits = rest.calls.get("edit_message", 0) + rest.calls.get("send_message", 0) - edits_before
+    results.append(await measure("blacklist matcher search", lambda: blacklist.matcher.search("hello there this is a normal message"), args.iterations * 10))
+    # raid spam: one repeated letter that starts every term, as words of a 4000-char (Nitro) message
+    spam = "t " * 2000
+    results.append(await measure("blacklist matcher search (4000-char letter spam)", lambda: blacklist.matcher.search(spam), max(1, args.iterations // 10)))
+
+    print_results(results)
+    print(f"blacklist: {edits / n:.2f} message edits/sends per append")
+    print(f"lazy members: {queries:.1f} query_members requests per 250-id bulk resolve")
+    if args.sync_messages:
+        print("\n".join(await bench_sync(guild, args.sync_messages)))
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Offline hot-path benchmarks with fake Discord objects")
+    parser.add_argument("--members", type=int, default=100000)
+    parser.add_argument("--roles", type=int, default=50)
+    parser.add_argument("--logs", type=int, default=200000)
+    parser.add_argument("--blacklist", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--sync-messages", type=int, default=0, help="also time a channel backfill of this many log messages")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,106 @@
+"""
+Parse throughput of the modlog codec vs the original regex extractor.
+
+    python benchmarks/bench_modlog_codec.py [--messages 20000] [--log-ratio 0.3] [--repeat 5]
+
+The corpus mixes log messages (v1, compact v2, batch) with ordinary chat-style messages,
+which is what a history scan of the mod-log channel actually sees.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modlog_codec  # noqa: E402
+
+LEGACY_PREFIX = "__modlog__:"
+
+def legacy_extract(content: str):
+    # the pre-codec _extract_modlog_from_content, kept verbatim as the baseline
+    if not content:
+        return None
+    m = re.search(re.escape(LEGACY_PREFIX) + r'(\{.*\})', content)
+    if not m:
+        stripped = content
+        if stripped.startswith("||") and stripped.endswith("||"):
+            stripped = stripped[2:-2]
+            m = re.search(re.escape(LEGACY_PREFIX) + r'(\{.*\})', stripped)
+            if not m:
+                return None
+        else:
+            return None
+    try:
+        return json.loads(m.group(1))
+    except Exception:
+        return None
+
+def _entry(rng: random.Random, i: int) -> dict:
+    return {
+        "user": rng.randrange(10**17, 10**18),
+        "moderator": rng.randrange(10**17, 10**18),
+        "action": rng.choice(["warn", "kick", "ban", "timeout"]),
+        "reason": " ".join(rng.choice(["spam", "raid", "slurs", "nsfw", "ads", "alt account"]) for _ in range(rng.randint(1, 8))),
+        "timestamp": 1762966140 + i,
+        "duration": rng.choice([None, 10, 60, 1440]),
+        "log_id": i,
+    }
+
+def build_corpus(n: int, log_ratio: float, seed: int = 1234) -> list:
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(n):
+        if rng.random() < log_ratio:
+            kind = rng.random()
+            if kind < 0.6:
+                corpus.append(modlog_codec.encode(_entry(rng, i)))
+            elif kind < 0.9:
+                corpus.append(modlog_codec.encode(_entry(rng, i), compact=True))
+            else:
+                corpus.append(modlog_codec.encode([_entry(rng, i + k) for k in range(5)]))
+        else:
+            words = rng.randint(3, 40)
+            corpus.append(" ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(words)))
+    return corpus
+
+def bench(fn, corpus: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in corpus:
+            fn(content)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--log-ratio", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages, args.log_ratio)
+    v1 = [c for c in corpus if c.startswith("||" + LEGACY_PREFIX)]
+    payload_v1 = sum(len(c) for c in v1) / max(1, len(v1))
+    compact = [modlog_codec.encode(modlog_codec.decode(c), compact=True) for c in v1 if modlog_codec.decode(c)]
+    payload_v2 = sum(len(c) for c in compact) / max(1, len(compact))
+
+    rows = [
+        ("legacy regex (mixed)", bench(legacy_extract, corpus, args.repeat)),
+        ("codec decode (mixed)", bench(modlog_codec.decode, corpus, args.repeat)),
+        ("codec decode_entries (mixed)", bench(modlog_codec.decode_entries, corpus, args.repeat)),
+        ("legacy regex (non-log only)", bench(legacy_extract, [c for c in corpus if "__m" not in c], args.repeat)),
+        ("codec decode (non-log only)", bench(modlog_codec.decode, [c for c in corpus if "__m" not in c], args.repeat)),
+    ]
+    print(f"corpus: {len(corpus)} messages, {args.log_ratio:.0%} logs")
+    for name, rate in rows:
+        print(f"  {name:<32} {rate:>12,.0f} msgs/s")
+    print(f"  avg v1 content {payload_v1:.0f} chars -> compact v2 {payload_v2:.0f} chars")
+
+if __name__ == "__main__":
+    main()
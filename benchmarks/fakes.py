@@ -0,0 +1,229 @@
+"""
+In-process stand-ins for the discord.py objects the bot's hot paths touch.
+
+They implement only the attributes and coroutines main.py actually uses, so handlers can be
+driven offline with synthetic guilds of any size. Every simulated REST call goes through
+`FakeRest.call`, which counts it and can add latency.
+"""
+import asyncio
+import itertools
+import random
+from datetime import datetime, timedelta, timezone
+
+_ids = itertools.count(1_300_000_000_000_000_000)
+
+def snowflake() -> int:
+    return next(_ids)
+
+class FakeRest:
+    """Counts simulated REST calls per route and optionally sleeps to model latency."""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = {}
+
+    async def call(self, route: str):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+class FakePermissions:
+    def __init__(self, manage_messages: bool = False, view_channel: bool = True):
+        self.manage_messages = manage_messages
+        self.view_channel = view_channel
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str = "role"):
+        self.id = role_id
+        self.name = name
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str, rest: FakeRest):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.bot = False
+        self._rest = rest
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content=None, **kwargs):
+        await self._rest.call("dm")
+
+class FakeMember(FakeUser):
+    def __init__(self, user_id: int, name: str, roles: list, guild, rest: FakeRest, joined_at=None):
+        super().__init__(user_id, name, rest)
+        self.roles = roles
+        self.guild = guild
+        self.joined_at = joined_at
+        self.guild_permissions = FakePermissions()
+
+    async def kick(self, reason=None):
+        await self._rest.call("kick")
+
+    async def ban(self, reason=None, **kwargs):
+        await self._rest.call("ban")
+
+    async def timeout(self, until, reason=None):
+        await self._rest.call("timeout")
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None, message_id: int = None):
+        self.id = message_id or snowflake()
+        self.channel = channel
+        self.content = content or ""
+        self.embed = embed
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        await self.channel._rest.call("edit_message")
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embed = embed
+        return self
+
+    async def delete(self):
+        await self.channel._rest.call("delete_message")
+        self.channel.messages.pop(self.id, None)
+
+class FakeTextChannel:
+    def __init__(self, channel_id: int, name: str, guild, rest: FakeRest):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.messages = {}  # id -> FakeMessage, ids increase with time
+        self._rest = rest
+
+    def permissions_for(self, member):
+        return FakePermissions()
+
+    async def send(self, content=None, embed=None, **kwargs):
+        await self._rest.call("send_message")
+        msg = FakeMessage(self, content, embed)
+        self.messages[msg.id] = msg
+        return msg
+
+    def get_partial_message(self, message_id: int):
+        return self.messages.get(message_id) or FakeMessage(self, message_id=message_id)
+
+    async def fetch_message(self, message_id: int):
+        await self._rest.call("fetch_message")
+        return self.messages[message_id]
+
+    async def history(self, limit=None, after=None, oldest_first=None):
+        # pages of 100 like the real client: one simulated REST call per page
+        ids = sorted(self.messages, reverse=not oldest_first)
+        if after is not None:
+            ids = [i for i in ids if i > after.id]
+        if limit is not None:
+            ids = ids[:limit]
+        for n, message_id in enumerate(ids):
+            if n % 100 == 0:
+                await self._rest.call("history")
+            yield self.messages[message_id]
+
+class FakeGuild:
+    def __init__(self, guild_id: int, name: str, rest: FakeRest):
+        self.id = guild_id
+        self.name = name
+        self.roles = []
+        self._members = {}
+        self._channels = {}
+        self._rest = rest
+        self.cache_members = True  # False mimics MemberCacheFlags.none(): get_member misses, query_members works
+        self.me = FakeMember(snowflake(), "bot", [], self, rest)
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    @property
+    def text_channels(self):
+        return list(self._channels.values())
+
+    def get_member(self, user_id: int):
+        return self._members.get(user_id) if self.cache_members else None
+
+    async def query_members(self, query=None, *, limit=5, user_ids=None, presences=False, cache=True):
+        await self._rest.call("query_members")  # a gateway request, counted alongside REST calls
+        return [self._members[uid] for uid in (user_ids or []) if uid in self._members][:limit]
+
+    async def fetch_member(self, user_id: int):
+        await self._rest.call("fetch_member")
+        return self._members[user_id]
+
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+
+    async def ban(self, user, reason=None, **kwargs):
+        await self._rest.call("ban")
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self, route: str):
+        if self._done:
+            raise RuntimeError("interaction already responded to")
+        self._done = True
+        await self._interaction._rest.call(route)
+        self._interaction.responded_at = asyncio.get_running_loop().time()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond("interaction_response")
+
+    async def edit_message(self, **kwargs):
+        await self._respond("interaction_response")
+
+    async def defer(self, **kwargs):
+        await self._respond("interaction_response")
+
+    async def send_modal(self, modal):
+        await self._respond("interaction_response")
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        await self._interaction._rest.call("followup")
+        return FakeMessage(self._interaction.channel, content)
+
+class FakeInteraction:
+    def __init__(self, user: FakeMember, guild: FakeGuild, channel: FakeTextChannel, rest: FakeRest):
+        self.user = user
+        self.guild = guild
+        self.channel = channel
+        self._rest = rest
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.created_at = asyncio.get_running_loop().time()
+        self.responded_at = None
+
+def build_guild(guild_id: int, members: int, roles: int, tier_role_ids=(), channels: int = 10,
+                rest: FakeRest = None, seed: int = 42) -> FakeGuild:
+    """A synthetic guild: `roles` roles (tier roles included), members holding 0-5 of them."""
+    rng = random.Random(seed)
+    rest = rest or FakeRest()
+    guild = FakeGuild(guild_id, "Synthetic Guild", rest)
+    role_ids = list(tier_role_ids) + [snowflake() for _ in range(max(0, roles - len(tier_role_ids)))]
+    guild.roles = [FakeRole(rid, f"role-{i}") for i, rid in enumerate(role_ids)]
+    now = datetime.now(timezone.utc)
+    for i in range(members):
+        uid = snowflake()
+        held = rng.sample(guild.roles, rng.randint(0, min(5, len(guild.roles))))
+        guild._members[uid] = FakeMember(uid, f"user{i}", held, guild, rest, joined_at=now - timedelta(minutes=rng.randint(0, 10**6)))
+    for i in range(channels):
+        cid = snowflake()
+        guild._channels[cid] = FakeTextChannel(cid, f"channel-{i}", guild, rest)
+    return guild
+
+def add_channel(guild: FakeGuild, channel_id: int, name: str) -> FakeTextChannel:
+    channel = FakeTextChannel(channel_id, name, guild, guild._rest)
+    guild._channels[channel_id] = channel
+    return channel
@@ -0,0 +1,231 @@
+"""
+Interaction load test: replays synthetic /warn, /log and /ban invocations against the command
+callbacks in main.py while every outbound REST call goes to a local fake Discord HTTP server.
+
+    python benchmarks/loadtest.py [--rate 50] [--duration 20] [--mix warn=5,log=3,ban=1]
+                                  [--latency 0.08] [--jitter 0.04] [--route-limit 5/1]
+                                  [--p429 0.0] [--members 5000] [--logs 20000]
+
+The fake server answers after latency +- jitter, enforces a fixed-window limit per route
+(`--route-limit N/seconds`, answering 429 with retry_after) and can inject random 429s;
+interaction responses/followups are exempt, as Discord buckets those per interaction token.
+The client side retries 429s after retry_after, like discord.py's HTTP client. Reports
+throughput, 3-second deadline misses (time to first interaction response) and latency
+histograms for acknowledgement and completion.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db  # noqa: E402
+
+db.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="modbot-loadtest-"), "loadtest.db")
+
+import main  # noqa: E402  (safe: the bot only runs under __main__)
+import fakes  # noqa: E402
+
+# the throwaway database is seeded with the legacy guild's config on import
+CONFIG = main.LEGACY_GUILD_CONFIG
+
+DEADLINE = 3.0  # seconds Discord allows before the first interaction response
+# interaction callbacks/followups are bucketed per interaction token, so a shared route limit doesn't apply
+PER_TOKEN_ROUTES = {"interaction_response", "followup"}
+BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 3000, 5000)
+
+# ----------------------------
+# Fake Discord REST server
+# ----------------------------
+class FakeDiscordServer:
+    def __init__(self, latency: float, jitter: float, limit: int, window: float, p429: float, seed: int = 3):
+        self.latency = latency
+        self.jitter = jitter
+        self.limit = limit
+        self.window = window
+        self.p429 = p429
+        self.rng = random.Random(seed)
+        self.windows = {}  # route -> (window start, requests in window)
+        self.served = 0
+        self.limited = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        route = request.match_info["route"]
+        now = time.monotonic()
+        start, count = self.windows.get(route, (now, 0))
+        if now - start >= self.window:
+            start, count = now, 0
+        limited = route not in PER_TOKEN_ROUTES and (count >= self.limit or self.rng.random() < self.p429)
+        if limited:
+            self.limited += 1
+            retry_after = max(0.01, self.window - (now - start)) if count >= self.limit else 0.25
+            return web.json_response({"message": "You are being rate limited.", "retry_after": retry_after, "global": False}, status=429)
+        self.windows[route] = (start, count + 1)
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        self.served += 1
+        return web.json_response({"id": str(fakes.snowflake())})
+
+    async def start(self) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/api/{route}", self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return runner
+
+class HttpRest(fakes.FakeRest):
+    """FakeRest that performs each call against the fake server and retries 429s."""
+    def __init__(self, session: aiohttp.ClientSession, base_url: str):
+        super().__init__()
+        self.session = session
+        self.base_url = base_url
+        self.rate_limited = {}
+
+    async def call(self, route: str):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        while True:
+            async with self.session.post(f"{self.base_url}/api/{route}") as resp:
+                if resp.status != 429:
+                    return await resp.json()
+                data = await resp.json()
+            self.rate_limited[route] = self.rate_limited.get(route, 0) + 1
+            await asyncio.sleep(data["retry_after"])
+
+# ----------------------------
+# Load generator
+# ----------------------------
+def histogram(samples_ms: list) -> str:
+    counts = [0] * (len(BUCKETS_MS) + 1)
+    for v in samples_ms:
+        for i, edge in enumerate(BUCKETS_MS):
+            if v <= edge:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    widest = max(counts) or 1
+    lines = []
+    for i, c in enumerate(counts):
+        label = f"<= {BUCKETS_MS[i]} ms" if i < len(BUCKETS_MS) else f"> {BUCKETS_MS[-1]} ms"
+        lines.append(f"  {label:>12} {c:>7} {'#' * round(40 * c / widest)}")
+    return "\n".join(lines)
+
+def percentile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+async def run(args):
+    server = FakeDiscordServer(args.latency, args.jitter, *args.route_limit, args.p429)
+    runner = await server.start()
+    async with aiohttp.ClientSession() as session:
+        rest = HttpRest(session, f"http://127.0.0.1:{server.port}")
+        guild = fakes.build_guild(CONFIG.guild_id, args.members, 50, tier_role_ids=list(CONFIG.permission_tiers), rest=rest)
+        members = guild.members
+        moderator = members[0]
+        moderator.roles = [fakes.FakeRole(next(iter(CONFIG.permission_tiers)), "owner")]
+        channel = fakes.add_channel(guild, CONFIG.mod_log_channel_id, "mod-log")
+        main.bot.get_channel = lambda cid: guild.get_channel(cid)
+        rng = random.Random(11)
+        db.upsert_mod_logs(guild.id, [({"user": rng.choice(members).id, "moderator": moderator.id, "action": rng.choice(["warn", "ban", "timeout"]),
+                              "reason": "seed", "timestamp": 1700000000 + i}, fakes.snowflake()) for i in range(args.logs)])
+
+        commands = {
+            "warn": lambda it, target: main.warn.callback(it, target, "load test"),
+            "ban": lambda it, target: main.ban.callback(it, target, "load test"),
+            "log": lambda it, target: main.log.callback(it, target),
+        }
+        mix = parse_mix(args.mix)
+        names = [n for n in mix if n in commands]
+        weights = [mix[n] for n in names]
+
+        results = {n: {"ack": [], "done": [], "errors": 0} for n in names}
+        tasks = []
+
+        async def invoke(name: str):
+            interaction = fakes.FakeInteraction(moderator, guild, channel, rest)
+            target = rng.choice(members[1:])
+            try:
+                await commands[name](interaction, target)
+            except Exception as e:
+                results[name]["errors"] += 1
+                if results[name]["errors"] <= 3:
+                    print(f"⚠️ {name} failed: {e!r}")
+                return
+            end = asyncio.get_running_loop().time()
+            ack = (interaction.responded_at or end) - interaction.created_at
+            results[name]["ack"].append(ack * 1000)
+            results[name]["done"].append((end - interaction.created_at) * 1000)
+
+        async def outbox_flusher():
+            while True:
+                await main.flush_modlog_outbox()
+                await asyncio.sleep(0.2)
+
+        flusher = asyncio.create_task(outbox_flusher())
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        total = int(args.rate * args.duration)
+        for i in range(total):
+            # open-loop arrivals: keep the schedule even if the bot falls behind
+            delay = started + i / args.rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(invoke(rng.choices(names, weights)[0])))
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+        flusher.cancel()
+
+    await runner.cleanup()
+
+    print(f"\n{total} interactions in {elapsed:.1f}s ({total / elapsed:.1f}/s offered {args.rate}/s), "
+          f"server latency {args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, limit {args.route_limit[0]}/{args.route_limit[1]}s per route")
+    for name in names:
+        r = results[name]
+        acks, done = r["ack"], r["done"]
+        missed = sum(1 for a in acks if a > DEADLINE * 1000)
+        print(f"\n/{name}: {len(acks)} ok, {r['errors']} errors, deadline misses {missed} ({missed / max(1, len(acks)):.1%})")
+        print(f"  ack  p50 {percentile(acks, 0.5):.0f} ms  p99 {percentile(acks, 0.99):.0f} ms")
+        print(f"  done p50 {percentile(done, 0.5):.0f} ms  p99 {percentile(done, 0.99):.0f} ms")
+        print(" time to first response:")
+        print(histogram(acks))
+        print(" time to completion:")
+        print(histogram(done))
+    print(f"\nREST calls: {dict(sorted(rest.calls.items()))}")
+    print(f"429s seen by client: {dict(sorted(rest.rate_limited.items()))} (server limited {server.limited}, served {server.served})")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Interaction load test against a fake Discord REST server")
+    parser.add_argument("--rate", type=float, default=50, help="interactions per second")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--mix", default="warn=5,log=3,ban=1")
+    parser.add_argument("--latency", type=float, default=0.08, help="fake server latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.04)
+    parser.add_argument("--route-limit", default="50/1", type=lambda s: (int(s.split("/")[0]), float(s.split("/")[1])),
+                        help="requests per window per route, e.g. 5/1")
+    parser.add_argument("--p429", type=float, default=0.0, help="probability of a random 429")
+    parser.add_argument("--members", type=int, default=5000)
+    parser.add_argument("--logs", type=int, default=20000)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,98 @@
+import re
+import unicodedata
+
+# ----------------------------
+# Blacklist matcher
+# ----------------------------
+# Terms are compiled into one trie over their letters. Matches must start at a word start, so a
+# message costs one short trie walk per word: independent of how many terms exist. Repeated
+# letters in a message ("buuum") are absorbed while walking, by letting a state loop on the
+# letter that led into it; the term's own letters are kept as written, so "ass" never matches "as".
+# Building is linear in the total term length, so rebuilding on every add/remove stays cheap
+# even with thousands of terms (a combined regex of that size takes seconds to compile).
+
+# common character substitutions used to dodge filters
+LEET_MAP = str.maketrans({
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t",
+    "@": "a", "$": "s", "€": "e",
+})
+ZERO_WIDTH = dict.fromkeys(map(ord, "​‌‍⁠﻿­"), None)
+
+# runs of letters/digits; anything else ("b.u.m", "b u m", "b_u_m") is a separator
+_WORD = re.compile(r"[^\W_]+")
+
+def normalize(text: str) -> str:
+    """Case-fold, strip accents / zero-width characters and undo leetspeak."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text.translate(ZERO_WIDTH))
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return text.casefold().translate(LEET_MAP)
+
+def squash(text: str):
+    """
+    Normalized letters with separators removed ("b.u.u m" -> "buum"), plus the set of
+    positions that start a word in the original text.
+    """
+    letters, starts, offset = [], set(), 0
+    for word in _WORD.findall(normalize(text)):
+        starts.add(offset)
+        letters.append(word)
+        offset += len(word)
+    return "".join(letters), starts
+
+def _term_key(term: str) -> str:
+    return squash(term)[0]
+
+class BlacklistMatcher:
+    def __init__(self, terms=()):
+        # trie as parallel lists: goto[state] maps char -> next state, terminal[state] ends a term,
+        # char[state] is the letter that leads into the state (the one it may repeat)
+        self._goto = [{}]
+        self._terminal = [False]
+        self._char = [None]
+        for term in terms:
+            key = _term_key(term)
+            if key:
+                self._add(key)
+
+    def _add(self, key: str):
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._terminal.append(False)
+                self._char.append(ch)
+            state = nxt
+        self._terminal[state] = True
+
+    def search(self, text: str):
+        """Return the offending (normalized) snippet, or None if the text is clean."""
+        if len(self._goto) == 1 or not text:
+            return None
+        letters, starts = squash(text)
+        goto, terminal, char = self._goto, self._terminal, self._char
+        end = len(letters)
+        # (position, state) pairs already walked from an earlier start: whether a term can finish
+        # from there doesn't depend on where the walk began, so each pair is expanded once per
+        # message and "b b b b ..." spam stays linear instead of re-walking the tail per word
+        seen = set()
+        for start in sorted(starts):
+            states, i = (0,), start
+            while i < end:
+                ch = letters[i]
+                # advance along the trie, or stay put on a repeat of the state's own letter
+                nxt = {goto[s][ch] for s in states if ch in goto[s]}
+                nxt.update(s for s in states if char[s] == ch)
+                i += 1
+                nxt = {s for s in nxt if (i, s) not in seen}
+                if not nxt:
+                    break
+                seen.update((i, s) for s in nxt)
+                states = nxt
+                # whole-word only, so "bum" doesn't fire on "album" or "bummer"
+                if (i == end or i in starts) and any(terminal[s] for s in states):
+                    return letters[start:i]
+        return None
@@ -0,0 +1,603 @@
+import json
+import sqlite3
+
+# ----------------------------
+# Local SQLite store (mod_logs.db)
+# ----------------------------
+DB_PATH = "mod_logs.db"
+
+_conn = None
+
+def get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_PATH)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        init_db(_conn)
+    return _conn
+
+def _columns(conn: sqlite3.Connection, table: str):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def init_db(conn: sqlite3.Connection):
+    # mod_logs already exists in older databases (without msg_id); create or migrate it in place.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mod_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            reason TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            duration INTEGER
+        )
+    """)
+    if "msg_id" not in _columns(conn, "mod_logs"):
+        conn.execute("ALTER TABLE mod_logs ADD COLUMN msg_id INTEGER")
+    # rows from single-guild databases keep guild_id NULL until adopt_unscoped_data() claims them
+    if "guild_id" not in _columns(conn, "mod_logs"):
+        conn.execute("ALTER TABLE mod_logs ADD COLUMN guild_id INTEGER")
+    conn.execute("DROP INDEX IF EXISTS idx_mod_logs_user_action_ts")
+    conn.execute("DROP INDEX IF EXISTS idx_mod_logs_user_ts_id")
+    # timestamp is a TEXT column holding 10-digit unix seconds, so text ordering == numeric ordering
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mod_logs_guild_user_action_ts ON mod_logs (guild_id, user_id, action, timestamp)")
+    # keyset paging (timestamp, id) over "everything except warns" walks this one in order
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mod_logs_guild_user_ts_id ON mod_logs (guild_id, user_id, timestamp, id)")
+    # guild-wide time ranges of one action (seeding warn escalation windows)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mod_logs_guild_action_ts ON mod_logs (guild_id, action, timestamp)")
+    # one log message can carry several entries (bulk actions), one per user
+    conn.execute("DROP INDEX IF EXISTS idx_mod_logs_msg_id")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mod_logs_msg_user ON mod_logs (msg_id, user_id)")
+    # export walks a guild's entries in message order
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mod_logs_guild_msg_user ON mod_logs (guild_id, msg_id, user_id)")
+    _init_mod_stats(conn)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS modlog_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL DEFAULT 0
+        )
+    """)
+    if "guild_id" not in _columns(conn, "modlog_outbox"):
+        conn.execute("ALTER TABLE modlog_outbox ADD COLUMN guild_id INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_modlog_outbox_due ON modlog_outbox (next_attempt)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS guild_config (
+            guild_id INTEGER PRIMARY KEY,
+            mod_log_channel_id INTEGER,
+            blacklist_channel_id INTEGER,
+            blacklist_message_id INTEGER,
+            permission_tiers TEXT NOT NULL DEFAULT '{}'
+        )
+    """)
+    if "escalation_rules" not in _columns(conn, "guild_config"):
+        conn.execute("ALTER TABLE guild_config ADD COLUMN escalation_rules TEXT NOT NULL DEFAULT '[]'")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS guild_blacklist (
+            guild_id INTEGER NOT NULL,
+            item TEXT NOT NULL,
+            PRIMARY KEY (guild_id, item)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS guild_blacklist_shards (
+            guild_id INTEGER NOT NULL,
+            shard INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            content_hash TEXT,
+            PRIMARY KEY (guild_id, shard)
+        )
+    """)
+    # single-guild tables: emptied into guild_blacklist / guild_blacklist_shards by adopt_unscoped_data()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blacklist_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item TEXT UNIQUE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blacklist_shards (
+            shard INTEGER PRIMARY KEY,
+            message_id INTEGER NOT NULL,
+            content_hash TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scheduled_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            run_at REAL NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    # the scheduler keeps its own in-memory heap, so only cancel-by-target needs an index
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_actions_target ON scheduled_actions (guild_id, user_id, action)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    conn.commit()
+
+# Moderation rollups: one counter per (guild, user or moderator, UTC day, action), kept in step
+# with mod_logs by triggers, so every write path (outbox enqueue, channel sync, deletes) updates
+# them in its own transaction and range queries never touch mod_logs.
+_MOD_STATS_SUBJECTS = (("user", "user_id"), ("moderator", "moderator_id"))
+
+def _mod_stats_bump(row: str, delta: int) -> str:
+    return "".join(f"""
+        INSERT INTO mod_stats_daily (guild_id, kind, day, subject_id, action, count)
+        VALUES ({row}.guild_id, '{kind}', CAST({row}.timestamp AS INTEGER) / 86400, {row}.{column}, {row}.action, {delta})
+        ON CONFLICT (guild_id, kind, day, subject_id, action) DO UPDATE SET count = count + {delta};""" for kind, column in _MOD_STATS_SUBJECTS)
+
+def _init_mod_stats(conn: sqlite3.Connection):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'mod_stats_daily'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS mod_stats_daily (
+            guild_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            subject_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, kind, day, subject_id, action)
+        ) WITHOUT ROWID
+    """)
+    # unscoped rows (guild_id NULL) are counted once adopt_unscoped_data() gives them a guild
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mod_stats_insert AFTER INSERT ON mod_logs
+        WHEN NEW.guild_id IS NOT NULL BEGIN {_mod_stats_bump("NEW", 1)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mod_stats_delete AFTER DELETE ON mod_logs
+        WHEN OLD.guild_id IS NOT NULL BEGIN {_mod_stats_bump("OLD", -1)}
+        END
+    """)
+    # msg_id updates (outbox completion) don't touch the counters
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mod_stats_update_old AFTER UPDATE OF guild_id, user_id, moderator_id, action, timestamp ON mod_logs
+        WHEN OLD.guild_id IS NOT NULL BEGIN {_mod_stats_bump("OLD", -1)}
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mod_stats_update_new AFTER UPDATE OF guild_id, user_id, moderator_id, action, timestamp ON mod_logs
+        WHEN NEW.guild_id IS NOT NULL BEGIN {_mod_stats_bump("NEW", 1)}
+        END
+    """)
+    if not exists:
+        # first start with rollups: build them from the existing index once
+        for kind, column in _MOD_STATS_SUBJECTS:
+            conn.execute(f"""
+                INSERT INTO mod_stats_daily (guild_id, kind, day, subject_id, action, count)
+                SELECT guild_id, '{kind}', CAST(timestamp AS INTEGER) / 86400, {column}, action, COUNT(*)
+                FROM mod_logs WHERE guild_id IS NOT NULL
+                GROUP BY guild_id, CAST(timestamp AS INTEGER) / 86400, {column}, action
+            """)
+
+# ----------------------------
+# Small key/value state (cursors, high-water marks)
+# ----------------------------
+def get_state(key: str, default=None):
+    row = get_conn().execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+def set_state(key: str, value, commit: bool = True):
+    conn = get_conn()
+    conn.execute(
+        "INSERT INTO sync_state (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (key, str(value)),
+    )
+    if commit:
+        conn.commit()
+
+# ----------------------------
+# Guild configuration
+# ----------------------------
+def load_guild_config(guild_id: int):
+    row = get_conn().execute("SELECT * FROM guild_config WHERE guild_id = ?", (guild_id,)).fetchone()
+    if row is None:
+        return None
+    return dict(row, permission_tiers=json.loads(row["permission_tiers"]), escalation_rules=json.loads(row["escalation_rules"]))
+
+def save_guild_config(guild_id: int, mod_log_channel_id: int, blacklist_channel_id: int, blacklist_message_id: int,
+                      permission_tiers: dict, escalation_rules: list = ()):
+    conn = get_conn()
+    conn.execute(
+        """
+        INSERT INTO guild_config (guild_id, mod_log_channel_id, blacklist_channel_id, blacklist_message_id, permission_tiers, escalation_rules)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (guild_id) DO UPDATE SET
+            mod_log_channel_id = excluded.mod_log_channel_id,
+            blacklist_channel_id = excluded.blacklist_channel_id,
+            blacklist_message_id = excluded.blacklist_message_id,
+            permission_tiers = excluded.permission_tiers,
+            escalation_rules = excluded.escalation_rules
+        """,
+        (guild_id, mod_log_channel_id, blacklist_channel_id, blacklist_message_id, json.dumps(permission_tiers), json.dumps(list(escalation_rules))),
+    )
+    conn.commit()
+
+def count_guild_configs() -> int:
+    return get_conn().execute("SELECT COUNT(*) FROM guild_config").fetchone()[0]
+
+def adopt_unscoped_data(guild_id: int, state_keys: dict = None):
+    """
+    Hand everything written by the single-guild bot to `guild_id`: unscoped log rows and outbox
+    jobs, the legacy blacklist tables, and `state_keys` (old key -> new key) in sync_state.
+    """
+    conn = get_conn()
+    with conn:
+        conn.execute("UPDATE mod_logs SET guild_id = ? WHERE guild_id IS NULL", (guild_id,))
+        conn.execute("UPDATE modlog_outbox SET guild_id = ? WHERE guild_id IS NULL", (guild_id,))
+        conn.execute("INSERT OR IGNORE INTO guild_blacklist (guild_id, item) SELECT ?, item FROM blacklist_items", (guild_id,))
+        conn.execute("DELETE FROM blacklist_items")
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO guild_blacklist_shards (guild_id, shard, message_id, content_hash)
+            SELECT ?, shard, message_id, content_hash FROM blacklist_shards
+            """,
+            (guild_id,),
+        )
+        conn.execute("DELETE FROM blacklist_shards")
+        for old, new in (state_keys or {}).items():
+            conn.execute("UPDATE OR IGNORE sync_state SET key = ? WHERE key = ?", (new, old))
+
+# ----------------------------
+# Mod log index
+# ----------------------------
+def _row_to_meta(row: sqlite3.Row) -> dict:
+    return {
+        "guild": row["guild_id"],
+        "user": row["user_id"],
+        "moderator": row["moderator_id"],
+        "action": row["action"],
+        "reason": row["reason"],
+        "timestamp": int(row["timestamp"]),
+        "duration": row["duration"],
+        "msg_id": row["msg_id"],
+        "log_id": row["id"],
+    }
+
+_UPSERT_MOD_LOG = """
+    INSERT INTO mod_logs (guild_id, user_id, moderator_id, action, reason, timestamp, duration, msg_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (msg_id, user_id) DO UPDATE SET
+        moderator_id = excluded.moderator_id,
+        action = excluded.action,
+        reason = excluded.reason,
+        timestamp = excluded.timestamp,
+        duration = excluded.duration
+"""
+
+def _mod_log_params(guild_id: int, meta: dict, msg_id: int = None) -> tuple:
+    return (
+        guild_id,
+        int(meta["user"]),
+        int(meta["moderator"]),
+        meta["action"],
+        meta.get("reason") or "No reason provided",
+        str(int(meta.get("timestamp", 0))),
+        meta.get("duration"),
+        msg_id if msg_id is not None else meta.get("msg_id"),
+    )
+
+# entries posted from the outbox carry their local log_id: attach the message to that row
+_ATTACH_MOD_LOG = "UPDATE mod_logs SET msg_id = ? WHERE id = ? AND user_id = ? AND timestamp = ?"
+
+def _upsert_mod_log(conn: sqlite3.Connection, guild_id: int, meta: dict, msg_id: int = None):
+    if meta.get("log_id") is not None and msg_id is not None:
+        cur = conn.execute(_ATTACH_MOD_LOG, (msg_id, meta["log_id"], int(meta["user"]), str(int(meta.get("timestamp", 0)))))
+        if cur.rowcount:
+            return
+    conn.execute(_UPSERT_MOD_LOG, _mod_log_params(guild_id, meta, msg_id))
+
+def upsert_mod_logs(guild_id: int, entries, state: dict = None):
+    """
+    Insert (or refresh) modlog entries from (meta, msg_id) pairs, keyed by log message ID.
+    Optional `state` key/values are written in the same transaction, so a sync cursor
+    never gets ahead of the rows it covers.
+    """
+    conn = get_conn()
+    with conn:
+        for meta, msg_id in entries:
+            _upsert_mod_log(conn, guild_id, meta, msg_id)
+        for key, value in (state or {}).items():
+            set_state(key, value, commit=False)
+
+def delete_mod_log(msg_id: int) -> bool:
+    return delete_mod_logs([msg_id]) > 0
+
+def delete_mod_logs(msg_ids) -> int:
+    conn = get_conn()
+    cur = conn.executemany("DELETE FROM mod_logs WHERE msg_id = ?", [(i,) for i in msg_ids])
+    conn.commit()
+    return cur.rowcount
+
+def get_mod_log(log_id: int):
+    row = get_conn().execute("SELECT * FROM mod_logs WHERE id = ?", (log_id,)).fetchone()
+    return _row_to_meta(row) if row else None
+
+def delete_mod_log_by_id(log_id: int) -> bool:
+    conn = get_conn()
+    cur = conn.execute("DELETE FROM mod_logs WHERE id = ?", (log_id,))
+    conn.commit()
+    return cur.rowcount > 0
+
+def count_mod_logs(guild_id: int, user_id: int, only_warns: bool = False) -> int:
+    op = "=" if only_warns else "!="
+    row = get_conn().execute(
+        f"SELECT COUNT(*) FROM mod_logs WHERE guild_id = ? AND user_id = ? AND action {op} 'warn'", (guild_id, user_id)
+    ).fetchone()
+    return row[0]
+
+def page_mod_logs(guild_id: int, user_id: int, only_warns: bool = False, limit: int = 5, after=None, before=None, oldest: bool = False) -> list:
+    """
+    Keyset page of a user's logs, always returned newest -> oldest.
+    `after` / `before` are (timestamp, log_id) keys: rows older than `after`, or the rows just
+    newer than `before`. `oldest=True` returns the oldest `limit` rows (the last page).
+    """
+    op = "=" if only_warns else "!="
+    sql = f"SELECT * FROM mod_logs WHERE guild_id = ? AND user_id = ? AND action {op} 'warn'"
+    params = [guild_id, user_id]
+    if after is not None:
+        sql += " AND (timestamp < ? OR (timestamp = ? AND id < ?))"
+        params += [str(after[0]), str(after[0]), after[1]]
+    elif before is not None:
+        sql += " AND (timestamp > ? OR (timestamp = ? AND id > ?))"
+        params += [str(before[0]), str(before[0]), before[1]]
+    ascending = before is not None or oldest
+    sql += " ORDER BY timestamp ASC, id ASC LIMIT ?" if ascending else " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit)
+    rows = [_row_to_meta(r) for r in get_conn().execute(sql, params)]
+    return rows[::-1] if ascending else rows
+
+def recent_actions(guild_id: int, action: str, since: int) -> list:
+    """(user_id, timestamp) of a guild's `action` entries at or after `since`, oldest first."""
+    rows = get_conn().execute(
+        "SELECT user_id, timestamp FROM mod_logs WHERE guild_id = ? AND action = ? AND timestamp >= ? ORDER BY timestamp",
+        (guild_id, action, str(int(since))),
+    )
+    return [(r["user_id"], int(r["timestamp"])) for r in rows]
+
+def mod_log_exists_near(guild_id: int, user_id: int, action: str, reason: str, ts: int, slack: int) -> bool:
+    """Is there already an entry for this action on this user with this reason within `slack` seconds of `ts`?"""
+    row = get_conn().execute(
+        "SELECT 1 FROM mod_logs WHERE guild_id = ? AND user_id = ? AND action = ? AND timestamp BETWEEN ? AND ? AND reason = ? LIMIT 1",
+        (guild_id, user_id, action, str(int(ts - slack)), str(int(ts + slack)), reason),
+    ).fetchone()
+    return row is not None
+
+def open_reader() -> sqlite3.Connection:
+    """A separate read-only connection, for long scans run off the event loop's thread (WAL lets it read alongside writes)."""
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def iter_posted_mod_logs(guild_id: int, after_msg_id: int = 0, batch: int = 1000, conn: sqlite3.Connection = None):
+    """
+    Every entry of a guild that has a log message, in message order, fetched in keyset pages
+    of `batch` rows on the (msg_id, user_id) index, so memory stays flat however long the history.
+    Entries still waiting in the outbox have no msg_id yet and are picked up by a later call.
+    """
+    conn = conn or get_conn()
+    rows = conn.execute(
+        "SELECT * FROM mod_logs WHERE guild_id = ? AND msg_id > ? ORDER BY msg_id, user_id LIMIT ?",
+        (guild_id, after_msg_id, batch),
+    ).fetchall()
+    while rows:
+        for row in rows:
+            yield _row_to_meta(row)
+        if len(rows) < batch:
+            return
+        last = rows[-1]
+        rows = conn.execute(
+            "SELECT * FROM mod_logs WHERE guild_id = ? AND (msg_id, user_id) > (?, ?) ORDER BY msg_id, user_id LIMIT ?",
+            (guild_id, last["msg_id"], last["user_id"], batch),
+        ).fetchall()
+
+def _mod_stats_filter(guild_id: int, kind: str, first_day: int, last_day: int, action: str = None) -> tuple:
+    sql = "guild_id = ? AND kind = ? AND day BETWEEN ? AND ?"
+    params = [guild_id, kind, first_day, last_day]
+    if action is not None:
+        sql += " AND action = ?"
+        params.append(action)
+    return sql, params
+
+def count_mod_stats_subjects(guild_id: int, kind: str, first_day: int, last_day: int, action: str = None) -> int:
+    """How many users (kind='user') or moderators (kind='moderator') have entries in the day range."""
+    where, params = _mod_stats_filter(guild_id, kind, first_day, last_day, action)
+    row = get_conn().execute(
+        f"SELECT COUNT(DISTINCT subject_id) FROM mod_stats_daily WHERE {where} AND count > 0", params
+    ).fetchone()
+    return row[0]
+
+def top_mod_stats(guild_id: int, kind: str, first_day: int, last_day: int, action: str = None,
+                  limit: int = 10, offset: int = 0) -> list:
+    """
+    One page of subjects ranked by entry count over days [first_day, last_day] (UTC days since
+    the epoch): [{"subject", "total", "actions": {action: count}}], highest first.
+    """
+    where, params = _mod_stats_filter(guild_id, kind, first_day, last_day, action)
+    conn = get_conn()
+    ranked = conn.execute(
+        f"SELECT subject_id, SUM(count) AS total FROM mod_stats_daily WHERE {where} "
+        "GROUP BY subject_id HAVING total > 0 ORDER BY total DESC, subject_id LIMIT ? OFFSET ?",
+        params + [limit, offset],
+    ).fetchall()
+    if not ranked:
+        return []
+    page = {r["subject_id"]: {"subject": r["subject_id"], "total": r["total"], "actions": {}} for r in ranked}
+    breakdown = conn.execute(
+        f"SELECT subject_id, action, SUM(count) AS n FROM mod_stats_daily WHERE {where} "
+        f"AND subject_id IN ({','.join('?' * len(page))}) GROUP BY subject_id, action HAVING n > 0",
+        params + list(page),
+    )
+    for r in breakdown:
+        page[r["subject_id"]]["actions"][r["action"]] = r["n"]
+    return list(page.values())
+
+def mod_stats_totals(guild_id: int, first_day: int, last_day: int) -> dict:
+    """action -> entry count in the day range."""
+    rows = get_conn().execute(
+        "SELECT action, SUM(count) AS n FROM mod_stats_daily WHERE guild_id = ? AND kind = 'user' AND day BETWEEN ? AND ? "
+        "GROUP BY action HAVING n > 0 ORDER BY n DESC",
+        (guild_id, first_day, last_day),
+    )
+    return {r["action"]: r["n"] for r in rows}
+
+# ----------------------------
+# Modlog outbox (entries committed locally, posted to the channel by a worker)
+# ----------------------------
+def enqueue_mod_logs(guild_id: int, entries: list, render: dict = None) -> list:
+    """
+    Commit entries to mod_logs (msg_id still NULL) plus one outbox job that will post them.
+    Each entry gets its stable log ID (the mod_logs row id) stored under meta["log_id"].
+    """
+    conn = get_conn()
+    log_ids = []
+    with conn:
+        for meta in entries:
+            cur = conn.execute(_UPSERT_MOD_LOG, _mod_log_params(guild_id, meta, None))
+            meta["log_id"] = cur.lastrowid
+            log_ids.append(cur.lastrowid)
+        payload = dict(render or {}, entries=entries)
+        conn.execute("INSERT INTO modlog_outbox (guild_id, payload) VALUES (?, ?)", (guild_id, json.dumps(payload, ensure_ascii=False)))
+    return log_ids
+
+def _shard_filter(shards) -> tuple:
+    """
+    SQL filter keeping only guilds owned by `shards` = (shard_count, shard_ids), using Discord's
+    shard formula (guild_id >> 22) % shard_count, so processes sharing one database never post
+    each other's jobs. None means this process owns every shard.
+    """
+    if shards is None:
+        return "", []
+    count, ids = shards
+    return f" AND ((guild_id >> 22) % ?) IN ({','.join('?' * len(ids))})", [count, *ids]
+
+def due_outbox(now: float, limit: int = 25, shards=None) -> list:
+    where, params = _shard_filter(shards)
+    rows = get_conn().execute(
+        f"SELECT id, guild_id, payload, attempts FROM modlog_outbox WHERE next_attempt <= ?{where} ORDER BY id LIMIT ?",
+        (now, *params, limit),
+    ).fetchall()
+    return [(r["id"], r["guild_id"], json.loads(r["payload"]), r["attempts"]) for r in rows]
+
+def next_outbox_due(shards=None):
+    where, params = _shard_filter(shards)
+    row = get_conn().execute(f"SELECT MIN(next_attempt) AS due FROM modlog_outbox WHERE 1{where}", params).fetchone()
+    return row["due"]
+
+def complete_outbox(outbox_id: int, msg_id: int, log_ids):
+    conn = get_conn()
+    with conn:
+        conn.executemany("UPDATE mod_logs SET msg_id = ? WHERE id = ?", [(msg_id, i) for i in log_ids])
+        conn.execute("DELETE FROM modlog_outbox WHERE id = ?", (outbox_id,))
+
+def retry_outbox(outbox_id: int, attempts: int, next_attempt: float):
+    conn = get_conn()
+    conn.execute("UPDATE modlog_outbox SET attempts = ?, next_attempt = ? WHERE id = ?", (attempts, next_attempt, outbox_id))
+    conn.commit()
+
+def drop_outbox(outbox_id: int):
+    conn = get_conn()
+    conn.execute("DELETE FROM modlog_outbox WHERE id = ?", (outbox_id,))
+    conn.commit()
+
+def existing_log_ids(log_ids) -> set:
+    log_ids = list(log_ids)
+    if not log_ids:
+        return set()
+    marks = ",".join("?" * len(log_ids))
+    return {r["id"] for r in get_conn().execute(f"SELECT id FROM mod_logs WHERE id IN ({marks})", log_ids)}
+
+# ----------------------------
+# Scheduled actions (temp bans, role expiries, long timeouts)
+# ----------------------------
+def _scheduled_row(row: sqlite3.Row) -> dict:
+    return dict(row, payload=json.loads(row["payload"]))
+
+def add_scheduled_action(guild_id: int, user_id: int, action: str, run_at: float, payload: dict = None) -> dict:
+    conn = get_conn()
+    cur = conn.execute(
+        "INSERT INTO scheduled_actions (guild_id, user_id, action, run_at, payload) VALUES (?, ?, ?, ?, ?)",
+        (guild_id, user_id, action, run_at, json.dumps(payload or {}, ensure_ascii=False)),
+    )
+    conn.commit()
+    return {"id": cur.lastrowid, "guild_id": guild_id, "user_id": user_id, "action": action,
+            "run_at": run_at, "payload": payload or {}, "attempts": 0}
+
+def load_scheduled_actions(shards=None) -> list:
+    where, params = _shard_filter(shards)
+    rows = get_conn().execute(f"SELECT * FROM scheduled_actions WHERE 1{where}", params)
+    return [_scheduled_row(r) for r in rows]
+
+def reschedule_action(job_id: int, run_at: float, attempts: int):
+    conn = get_conn()
+    conn.execute("UPDATE scheduled_actions SET run_at = ?, attempts = ? WHERE id = ?", (run_at, attempts, job_id))
+    conn.commit()
+
+def delete_scheduled_action(job_id: int):
+    conn = get_conn()
+    conn.execute("DELETE FROM scheduled_actions WHERE id = ?", (job_id,))
+    conn.commit()
+
+def cancel_scheduled_actions(guild_id: int, user_id: int, action: str) -> list:
+    """Delete the target's pending `action` jobs; returns their ids."""
+    conn = get_conn()
+    with conn:
+        ids = [r["id"] for r in conn.execute(
+            "SELECT id FROM scheduled_actions WHERE guild_id = ? AND user_id = ? AND action = ?", (guild_id, user_id, action))]
+        conn.executemany("DELETE FROM scheduled_actions WHERE id = ?", [(i,) for i in ids])
+    return ids
+
+# ----------------------------
+# Blacklist
+# ----------------------------
+def load_blacklist_items(guild_id: int) -> list:
+    return [r["item"] for r in get_conn().execute("SELECT item FROM guild_blacklist WHERE guild_id = ?", (guild_id,))]
+
+def insert_blacklist_item(guild_id: int, item: str) -> bool:
+    conn = get_conn()
+    cur = conn.execute("INSERT OR IGNORE INTO guild_blacklist (guild_id, item) VALUES (?, ?)", (guild_id, item))
+    conn.commit()
+    return cur.rowcount > 0
+
+def delete_blacklist_item(guild_id: int, item: str):
+    conn = get_conn()
+    conn.execute("DELETE FROM guild_blacklist WHERE guild_id = ? AND item = ?", (guild_id, item))
+    conn.commit()
+
+def load_blacklist_shards(guild_id: int) -> dict:
+    """shard index -> (message_id, content_hash) for the messages rendering a guild's blacklist."""
+    rows = get_conn().execute("SELECT shard, message_id, content_hash FROM guild_blacklist_shards WHERE guild_id = ?", (guild_id,))
+    return {r["shard"]: (r["message_id"], r["content_hash"]) for r in rows}
+
+def save_blacklist_shard(guild_id: int, shard: int, message_id: int, content_hash: str):
+    conn = get_conn()
+    conn.execute(
+        """
+        INSERT INTO guild_blacklist_shards (guild_id, shard, message_id, content_hash) VALUES (?, ?, ?, ?)
+        ON CONFLICT (guild_id, shard) DO UPDATE SET message_id = excluded.message_id, content_hash = excluded.content_hash
+        """,
+        (guild_id, shard, message_id, content_hash),
+    )
+    conn.commit()
+
+def delete_blacklist_shards(guild_id: int):
+    conn = get_conn()
+    conn.execute("DELETE FROM guild_blacklist_shards WHERE guild_id = ?", (guild_id,))
+    conn.commit()
+
+def delete_blacklist_shard(guild_id: int, shard: int):
+    conn = get_conn()
+    conn.execute("DELETE FROM guild_blacklist_shards WHERE guild_id = ? AND shard = ?", (guild_id, shard))
+    conn.commit()
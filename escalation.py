@@ -0,0 +1,97 @@
+import bisect
+import collections
+
+# ----------------------------
+# Warn escalation
+# ----------------------------
+# Each guild has rules like "3 warns in 7 days -> 60 minute timeout". Warn timestamps per member
+# are kept in memory as sorted deques trimmed to the guild's longest rule window, so checking
+# the rules on a new warn never touches the log store; it is seeded once from mod_logs.db.
+
+ACTIONS = ("timeout", "kick", "ban", "tempban")
+DAY = 86400
+
+class EscalationRule:
+    __slots__ = ("warns", "window", "action", "duration")
+
+    def __init__(self, warns: int, window: int, action: str, duration: int = None):
+        self.warns = warns          # warns inside the window that trigger the rule
+        self.window = window        # seconds
+        self.action = action        # one of ACTIONS
+        self.duration = duration    # minutes, for timeout / tempban
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EscalationRule":
+        return cls(int(data["warns"]), int(data["window"]), data["action"], data.get("duration"))
+
+    def to_dict(self) -> dict:
+        return {"warns": self.warns, "window": self.window, "action": self.action, "duration": self.duration}
+
+    def describe(self) -> str:
+        days = self.window / DAY
+        window = f"{days:g} day(s)" if days >= 1 else f"{self.window // 3600} hour(s)"
+        then = self.action if not self.duration else f"{self.action} {self.duration} min"
+        return f"{self.warns} warns in {window} → {then}"
+
+def horizon(rules) -> int:
+    """How far back any rule looks; older warns can be forgotten."""
+    return max((r.window for r in rules), default=0)
+
+class WarnWindows:
+    """(guild id, user id) -> ascending deque of warn timestamps within the guild's horizon."""
+    def __init__(self):
+        self._warns = {}
+
+    def __len__(self):
+        return len(self._warns)
+
+    def _trim(self, key, cutoff: int):
+        warns = self._warns.get(key)
+        if warns is None:
+            return None
+        while warns and warns[0] < cutoff:
+            warns.popleft()
+        if not warns:
+            del self._warns[key]
+            return None
+        return warns
+
+    def seed(self, guild_id: int, rows):
+        """`rows` are (user_id, timestamp) pairs in ascending timestamp order."""
+        for user_id, ts in rows:
+            self._warns.setdefault((guild_id, user_id), collections.deque()).append(int(ts))
+
+    def add(self, guild_id: int, user_id: int, ts: int, keep: int):
+        key = (guild_id, user_id)
+        warns = self._warns.setdefault(key, collections.deque())
+        if warns and warns[-1] > ts:
+            bisect.insort(warns, ts)  # out-of-order (synced) warn; rare
+        else:
+            warns.append(ts)
+        self._trim(key, ts - keep)
+
+    def remove(self, guild_id: int, user_id: int, ts: int):
+        warns = self._warns.get((guild_id, user_id))
+        if warns is not None and ts in warns:
+            warns.remove(ts)
+            if not warns:
+                del self._warns[(guild_id, user_id)]
+
+    def count_since(self, guild_id: int, user_id: int, since: int) -> int:
+        warns = self._warns.get((guild_id, user_id))
+        if not warns:
+            return 0
+        return len(warns) - bisect.bisect_left(warns, since)
+
+    def forget_guild(self, guild_id: int):
+        for key in [k for k in self._warns if k[0] == guild_id]:
+            del self._warns[key]
+
+def match(rules, windows: WarnWindows, guild_id: int, user_id: int, now: int):
+    """The strictest rule (most warns) the member now meets, with its count, or (None, 0)."""
+    best, best_count = None, 0
+    for rule in rules:
+        count = windows.count_since(guild_id, user_id, now - rule.window)
+        if count >= rule.warns and (best is None or rule.warns > best.warns):
+            best, best_count = rule, count
+    return best, best_count
@@ -0,0 +1,92 @@
+import argparse
+import csv
+import gzip
+import json
+import sys
+
+import discord
+
+import db
+import modlog_codec
+
+# ----------------------------
+# Moderation history export (gzipped JSONL / CSV)
+# ----------------------------
+# Entries are streamed in message order from the local index (keyset pages) or straight from the
+# mod-log channel (history pages) into a gzip writer, one row at a time, so memory stays flat
+# however long the history is. Each run can resume after the last message the previous one covered.
+
+FORMATS = ("jsonl", "csv")
+FIELDS = ("msg_id", "log_id", "timestamp", "action", "user", "moderator", "reason", "duration")
+INDEX_BATCH = 1000
+CURSOR_KEY = "export_cursor"  # per guild: "export_cursor:<guild id>" -> last exported message id
+
+class ExportWriter:
+    """Writes entries to a binary file object as gzipped JSONL or CSV, tracking the last message id."""
+    def __init__(self, fileobj, fmt: str = "jsonl"):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown export format {fmt!r}")
+        self._text = gzip.open(fileobj, "wt", encoding="utf-8", newline="")
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._text, FIELDS, extrasaction="ignore")
+            self._csv.writeheader()
+        self.count = 0
+        self.last_msg_id = None
+
+    def write(self, entry: dict):
+        row = {field: entry.get(field) for field in FIELDS}
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._text.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.count += 1
+        if entry.get("msg_id") is not None:
+            self.last_msg_id = entry["msg_id"]
+
+    def close(self):
+        # flushes the gzip trailer; the underlying file object stays open
+        self._text.close()
+
+def cursor_key(guild_id: int) -> str:
+    return f"{CURSOR_KEY}:{guild_id}"
+
+def export_index(guild_id: int, writer: ExportWriter, after_msg_id: int = 0, conn=None) -> ExportWriter:
+    """Stream a guild's indexed entries posted after `after_msg_id`. Blocking; run it in a thread."""
+    for meta in db.iter_posted_mod_logs(guild_id, after_msg_id, INDEX_BATCH, conn=conn):
+        writer.write(meta)
+    return writer
+
+async def export_channel(channel, writer: ExportWriter, after_msg_id: int = 0) -> ExportWriter:
+    """Stream every modlog entry in `channel` posted after `after_msg_id`, 100 messages per history page."""
+    after = discord.Object(id=after_msg_id) if after_msg_id else None
+    async for msg in channel.history(limit=None, after=after, oldest_first=True):
+        for meta in modlog_codec.decode_entries(msg.content):
+            writer.write(dict(meta, msg_id=msg.id))
+    return writer
+
+def main(argv=None):
+    """Offline export from mod_logs.db; the bot doesn't need to be running."""
+    parser = argparse.ArgumentParser(description="Export a guild's moderation history from the local index.")
+    parser.add_argument("guild_id", type=int)
+    parser.add_argument("output", help="destination file, e.g. modlogs.jsonl.gz")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("--after", type=int, default=None, help="only entries posted after this message id")
+    parser.add_argument("--resume", action="store_true", help="continue after the last exported message and advance the cursor")
+    parser.add_argument("--db", default=db.DB_PATH, help="path to mod_logs.db")
+    args = parser.parse_args(argv)
+
+    db.DB_PATH = args.db
+    after = args.after
+    if after is None:
+        after = int(db.get_state(cursor_key(args.guild_id), 0)) if args.resume else 0
+    with open(args.output, "wb") as f:
+        writer = ExportWriter(f, args.format)
+        export_index(args.guild_id, writer, after)
+        writer.close()
+    if args.resume and writer.last_msg_id is not None:
+        db.set_state(cursor_key(args.guild_id), writer.last_msg_id)
+    print(f"Exported {writer.count} entries to {args.output} (last message {writer.last_msg_id or after})", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import db
+from escalation import EscalationRule
+
+# ----------------------------
+# Per-guild configuration (guild_config table, cached in memory)
+# ----------------------------
+# Commands resolve their guild's settings through get(), which hits the database once per guild
+# per process; save() writes through and replaces the cached entry.
+
+# every command a permission tier can grant (/stats and /resync are process-wide: bot owner only)
+TIER_COMMANDS = (
+    "kick", "ban", "tempban", "timeout", "temprole", "log", "warn", "warnlog", "warndelete", "bulkban", "bulktimeout",
+    "blacklist_interface", "panel", "export", "modstats",
+)
+
+def compile_permission_tiers(tiers: dict) -> dict:
+    """Invert role id -> [commands] into command -> frozenset(role ids allowed to run it)."""
+    index = {}
+    for role_id, allowed_commands in tiers.items():
+        for command_name in allowed_commands:
+            index.setdefault(command_name, set()).add(role_id)
+    return {command_name: frozenset(role_ids) for command_name, role_ids in index.items()}
+
+class GuildConfig:
+    """One guild's channels and permission tiers, plus the permission index derived from them."""
+    __slots__ = ("guild_id", "mod_log_channel_id", "blacklist_channel_id", "blacklist_message_id",
+                 "permission_tiers", "escalation_rules", "command_roles", "tier_role_ids")
+
+    def __init__(self, guild_id: int, mod_log_channel_id: int = None, blacklist_channel_id: int = None,
+                 blacklist_message_id: int = None, permission_tiers: dict = None, escalation_rules=()):
+        self.guild_id = guild_id
+        self.mod_log_channel_id = mod_log_channel_id
+        self.blacklist_channel_id = blacklist_channel_id
+        self.blacklist_message_id = blacklist_message_id
+        # JSON round-trips turn role ids into strings
+        self.permission_tiers = {int(role_id): list(cmds) for role_id, cmds in (permission_tiers or {}).items()}
+        self.escalation_rules = [r if isinstance(r, EscalationRule) else EscalationRule.from_dict(r) for r in escalation_rules]
+        self.command_roles = compile_permission_tiers(self.permission_tiers)
+        self.tier_role_ids = frozenset(self.permission_tiers)
+
+    def replace(self, **changes) -> "GuildConfig":
+        fields = {name: getattr(self, name) for name in
+                  ("guild_id", "mod_log_channel_id", "blacklist_channel_id", "blacklist_message_id", "permission_tiers", "escalation_rules")}
+        fields.update(changes)
+        return GuildConfig(**fields)
+
+_cache = {}  # guild id -> GuildConfig, or None for guilds known to have no config
+
+def get(guild_id: int):
+    """The guild's config, or None if it hasn't been set up."""
+    try:
+        return _cache[guild_id]
+    except KeyError:
+        pass
+    row = db.load_guild_config(guild_id)
+    config = _cache[guild_id] = GuildConfig(**row) if row else None
+    return config
+
+def save(config: GuildConfig) -> GuildConfig:
+    db.save_guild_config(
+        config.guild_id, config.mod_log_channel_id, config.blacklist_channel_id,
+        config.blacklist_message_id, {str(r): cmds for r, cmds in config.permission_tiers.items()},
+        [r.to_dict() for r in config.escalation_rules],
+    )
+    _cache[config.guild_id] = config
+    return config
+
+def invalidate(guild_id: int = None):
+    if guild_id is None:
+        _cache.clear()
+    else:
+        _cache.pop(guild_id, None)
+
+def seed_legacy(config: GuildConfig, state_keys: dict = None):
+    """
+    First start of a multi-guild bot on a single-guild database: store `config` for the original
+    guild and hand it every row written before guilds were tracked.
+    """
+    if db.count_guild_configs():
+        return
+    db.adopt_unscoped_data(config.guild_id, state_keys)
+    save(config)
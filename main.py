@@ -4,13 +4,27 @@ from discord import app_commands
 from discord.ui import View, Button, Modal, TextInput, Select
 from dotenv import load_dotenv
 import webserver
+import db
+import escalation
+import export
+import guild_config
+import member_cache
+import metrics
+import scheduler
+import modlog_codec
+from blacklist_matcher import BlacklistMatcher
+from guild_config import GuildConfig
 import os
 from datetime import timedelta, datetime, timezone
 import json
 import re
+import hashlib
 import asyncio
+import time
 import aiohttp
-import io
+import sqlite3
+import tempfile
+from typing import Literal
 
 # ----------------------------
 # Load token and setup intents[
@@ -22,116 +36,435 @@ intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
+# Lazy member cache (opt-in, for big guilds): don't chunk every member at startup or cache them
+# all; keep a bounded LRU of members seen in interactions/joins and query the rest on demand.
+LAZY_MEMBERS = os.getenv("LAZY_MEMBERS", "").lower() in ("1", "true", "yes")
+MEMBER_CACHE_SIZE = int(os.getenv("MEMBER_CACHE_SIZE", "5000"))
+RECENT_JOINS_PER_GUILD = 2000  # bulk "joined_within" targets in lazy mode come from this ring
+
 # ----------------------------
-# Guild, channel and roles
+# Legacy single-guild settings
 # ----------------------------
-GUILD_ID = 1362770221034897639
-BLACKLIST_CHANNEL_ID = 1385956899752509532
-BLACKLIST_MESSAGE_ID = 1438983885517099112
-MOD_LOG_CHANNEL_ID = 1438981968380301403  # channel used for persistent mod logs
-
-
-
-
-PERMISSION_TIERS = {
-    1362889706563440900: ["kick", "ban", "timeout", "log", "warn", "warnlog", "warndelete", "blacklist_interface", "panel"], #owner
-    1362896066504036402: ["kick", "ban", "timeout", "log", "warn", "warnlog", "warndelete"], #co owner
-    1399809075252039824: ["kick", "ban", "timeout", "log", "warn", "warnlog", "warndelete"], # senior
-    1391861560967954483: ["kick", "ban", "timeout", "log", "warn", "warnlog", "warndelete"], # mod
-    1431713725362212917: ["blacklist_interface"], #blacklister
-    1399808293999738961: ["kick", "timeout", "log", "warn", "warnlog", "warndelete"], #junior
-    1440250118946164816: ["timeout", "warn", "warnlog", "warndelete", "log"], #trial
-}
+# Seeded into guild_config the first time the bot starts against an empty config table, so the
+# original deployment keeps working; other guilds are configured with /setup and /tier.
+LEGACY_GUILD_CONFIG = GuildConfig(
+    guild_id=1362770221034897639,
+    blacklist_channel_id=1385956899752509532,
+    blacklist_message_id=1438983885517099112,
+    mod_log_channel_id=1438981968380301403,  # channel used for persistent mod logs
+    permission_tiers={
+        1362889706563440900: ["kick", "ban", "tempban", "timeout", "temprole", "log", "warn", "warnlog", "warndelete", "bulkban", "bulktimeout", "blacklist_interface", "panel", "export", "modstats"], #owner
+        1362896066504036402: ["kick", "ban", "tempban", "timeout", "temprole", "log", "warn", "warnlog", "warndelete", "bulkban", "bulktimeout", "modstats"], #co owner
+        1399809075252039824: ["kick", "ban", "tempban", "timeout", "temprole", "log", "warn", "warnlog", "warndelete", "bulkban", "bulktimeout"], # senior
+        1391861560967954483: ["kick", "ban", "tempban", "timeout", "log", "warn", "warnlog", "warndelete"], # mod
+        1431713725362212917: ["blacklist_interface"], #blacklister
+        1399808293999738961: ["kick", "timeout", "log", "warn", "warnlog", "warndelete"], #junior
+        1440250118946164816: ["timeout", "warn", "warnlog", "warndelete", "log"], #trial
+    },
+)
+# the single-guild modlog high-water mark becomes that guild's (see sync_mod_log_channel)
+guild_config.seed_legacy(LEGACY_GUILD_CONFIG, state_keys={"modlog_hwm": f"modlog_hwm:{LEGACY_GUILD_CONFIG.guild_id}"})
 
 # ----------------------------
 # Bot setup
 # ----------------------------
-class MyBot(commands.Bot):
+COMMAND_SYNC_KEY = "command_tree_hash"  # sync_state key of the last synced (global) command tree
+LEGACY_COMMANDS_CLEARED_KEY = "legacy_guild_commands_cleared"  # set once the single-guild command copies are gone
+
+# Sharding: leave both unset to let one process run every shard Discord recommends; to split a
+# deployment across processes give each one the same SHARD_COUNT and its own SHARD_IDS ("0,1").
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(x) for x in os.getenv("SHARD_IDS", "").split(",") if x.strip()] or None
+
+HTTP_POOL_SIZE = 20        # connections in the shared session
+RELAY_TIMEOUT = 120        # seconds for one attachment download, end to end
+
+class MyBot(commands.AutoShardedBot):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents)
+        member_options = {}
+        if LAZY_MEMBERS:
+            member_options = {"member_cache_flags": discord.MemberCacheFlags.none(), "chunk_guilds_at_startup": False}
+        super().__init__(command_prefix="!", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS,
+                         http_trace=metrics.http_trace_config(), **member_options)
+        self.web_runner = None
+        self.loop_lag_task = None
+        self.http_session = None  # shared pool for non-Discord HTTP (attachment relay)
 
     async def setup_hook(self):
-        guild = discord.Object(id=GUILD_ID)
-        self.tree.copy_global_to(guild=guild)
-        await self.tree.sync(guild=guild)
-        print(f"✅ Slash commands synced to guild {GUILD_ID}")
+        self.http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=RELAY_TIMEOUT, sock_connect=10, sock_read=30),
+        )
+        webserver.register_metrics(metrics.prometheus_lines)
+        self.web_runner = await webserver.start(self)
+        self.loop_lag_task = asyncio.create_task(metrics.sample_loop_lag())
+        await self.sync_commands()
+
+    def command_tree_hash(self) -> str:
+        """Stable hash of the payload `tree.sync()` would upload."""
+        payload = sorted((cmd.to_dict(self.tree) for cmd in self.tree.get_commands()),
+                         key=lambda d: (d.get("type", 1), d["name"]))
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+    async def sync_commands(self, force: bool = False) -> bool:
+        """Sync the global slash commands only if they changed since the last successful sync."""
+        await self.clear_legacy_guild_commands()
+        digest = self.command_tree_hash()
+        if not force and db.get_state(COMMAND_SYNC_KEY) == digest:
+            print("✅ Slash commands unchanged, skipping sync")
+            return False
+        await self.tree.sync()
+        # only recorded after Discord accepted it, so a failed sync is retried on the next boot
+        db.set_state(COMMAND_SYNC_KEY, digest)
+        print("✅ Slash commands synced globally")
+        return True
+
+    async def clear_legacy_guild_commands(self):
+        """
+        The single-guild bot synced its commands to the legacy guild only. Those copies would show
+        next to the global ones there (with their old signatures), so they are removed once.
+        """
+        if db.get_state(LEGACY_COMMANDS_CLEARED_KEY) is not None:
+            return
+        legacy = discord.Object(id=LEGACY_GUILD_CONFIG.guild_id)
+        self.tree.clear_commands(guild=legacy)
+        try:
+            await self.tree.sync(guild=legacy)
+        except discord.Forbidden:
+            pass  # not in that guild: nothing to clear
+        db.set_state(LEGACY_COMMANDS_CLEARED_KEY, 1)
+        print(f"✅ Cleared guild-scoped slash commands in legacy guild {legacy.id}")
+
+    async def close(self):
+        if self.loop_lag_task is not None:
+            self.loop_lag_task.cancel()
+        if self.web_runner is not None:
+            await self.web_runner.cleanup()
+        if self.http_session is not None:
+            await self.http_session.close()
+        await super().close()
 
 bot = MyBot()
+member_lru = member_cache.MemberLRU(MEMBER_CACHE_SIZE)
+recent_joins = member_cache.RecentJoins(RECENT_JOINS_PER_GUILD)
 
 # ----------------------------
 # Permission helpers
 # ----------------------------
+# (guild id, member id) -> frozenset of allowed command names; in lazy member mode the key is
+# (guild id, frozenset of tier role ids held) instead, see resolve_member_permissions
+_member_permissions = {}
+
+def _allowed_commands(config: GuildConfig, role_ids) -> frozenset:
+    return frozenset(c for c, roles in config.command_roles.items() if not roles.isdisjoint(role_ids))
+
+def resolve_member_permissions(member: discord.Member, config: GuildConfig = None) -> frozenset:
+    if LAZY_MEMBERS:
+        # uncached members never get on_member_update, so a per-member memo could go stale;
+        # key on the tier roles carried by the (always current) interaction payload instead
+        config = config or guild_config.get(member.guild.id)
+        if config is None:
+            return frozenset()
+        key = (member.guild.id, frozenset(r.id for r in member.roles if r.id in config.tier_role_ids))
+        allowed = _member_permissions.get(key)
+        if allowed is None:
+            allowed = _member_permissions[key] = _allowed_commands(config, key[1])
+        return allowed
+    key = (member.guild.id, member.id)
+    allowed = _member_permissions.get(key)
+    if allowed is None:
+        config = config or guild_config.get(member.guild.id)
+        if config is None:
+            return frozenset()
+        allowed = _member_permissions[key] = _allowed_commands(config, {r.id for r in member.roles})
+    return allowed
+
+def invalidate_member_permissions(guild_id: int = None, member_id: int = None):
+    if guild_id is None:
+        _member_permissions.clear()
+    elif member_id is None:
+        for key in [k for k in _member_permissions if k[0] == guild_id]:
+            del _member_permissions[key]
+    else:
+        _member_permissions.pop((guild_id, member_id), None)
+
 async def check_permissions(interaction: discord.Interaction, command_name: str) -> bool:
-    member = interaction.guild.get_member(interaction.user.id)
-    if member is None:
-        member = await interaction.guild.fetch_member(interaction.user.id)
-    user_roles = [r.id for r in member.roles]
-    for role_id in user_roles:
-        allowed_commands = PERMISSION_TIERS.get(role_id, [])
-        if command_name in allowed_commands:
-            return True
-    return False
+    if interaction.guild is None:
+        return False
+    # guild interactions carry the invoking Member (with roles) in the payload: no fetch needed
+    member = interaction.user
+    if not isinstance(member, discord.Member):
+        member = interaction.guild.get_member(interaction.user.id) or member_lru.get(interaction.guild.id, interaction.user.id)
+        if member is None:
+            return False
+    elif LAZY_MEMBERS:
+        member_lru.put(member)
+    return command_name in resolve_member_permissions(member)
+
+@bot.listen("on_member_update")
+async def permissions_on_member_update(before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+        invalidate_member_permissions(after.guild.id, after.id)
+
+@bot.listen("on_member_remove")
+async def permissions_on_member_remove(member: discord.Member):
+    invalidate_member_permissions(member.guild.id, member.id)
+
+@bot.listen("on_member_join")
+async def member_cache_on_join(member: discord.Member):
+    if LAZY_MEMBERS:
+        member_lru.put(member)
+        recent_joins.add(member)
+
+@bot.listen("on_raw_member_remove")
+async def member_cache_on_remove(payload: discord.RawMemberRemoveEvent):
+    # fires for uncached members too, unlike on_member_remove
+    member_lru.discard(payload.guild_id, payload.user.id)
+
+@bot.listen("on_guild_role_delete")
+async def permissions_on_role_delete(role: discord.Role):
+    config = guild_config.get(role.guild.id)
+    if config is not None and role.id in config.tier_role_ids:
+        invalidate_member_permissions(role.guild.id)
+
+@bot.listen("on_guild_remove")
+async def config_on_guild_remove(guild: discord.Guild):
+    # the stored config stays (the bot may be re-invited); only this process's caches are dropped
+    invalidate_member_permissions(guild.id)
+    guild_config.invalidate(guild.id)
+    member_lru.discard(guild.id)
+    recent_joins.discard(guild.id)
+    warn_windows.forget_guild(guild.id)
+    _warn_windows_seeded.discard(guild.id)
 
 async def run_command_with_permission(interaction: discord.Interaction, command_name: str, func, *args, **kwargs):
-    if not await check_permissions(interaction, command_name):
-        await interaction.response.send_message("❌ You are not allowed to use this command.", ephemeral=True)
-        return
-    await func(interaction, *args, **kwargs)
+    # single choke point for every command: tag the invocation so nested phases are attributed to it
+    token = metrics.current_command.set(command_name)
+    start = time.perf_counter()
+    try:
+        if interaction.guild is None or guild_config.get(interaction.guild.id) is None:
+            await interaction.response.send_message("⚙️ This server isn't set up yet; an administrator can run `/setup`.", ephemeral=True)
+            return
+        with metrics.timed("permission"):
+            allowed = await check_permissions(interaction, command_name)
+        if not allowed:
+            await interaction.response.send_message("❌ You are not allowed to use this command.", ephemeral=True)
+            return
+        await func(interaction, *args, **kwargs)
+    except Exception:
+        metrics.inc(f"command_error:{command_name}")
+        raise
+    finally:
+        metrics.observe("total", time.perf_counter() - start)
+        metrics.current_command.reset(token)
+
+async def run_owner_command(interaction: discord.Interaction, command_name: str, func, *args, **kwargs):
+    """
+    run_command_with_permission for process-wide commands (/stats, /resync): they act on or expose
+    every guild, so only the bot's owner may run them, from any guild, and no tier can grant them.
+    """
+    token = metrics.current_command.set(command_name)
+    start = time.perf_counter()
+    try:
+        if not await bot.is_owner(interaction.user):
+            await interaction.response.send_message("❌ Only the bot's owner can use this command.", ephemeral=True)
+            return
+        await func(interaction, *args, **kwargs)
+    except Exception:
+        metrics.inc(f"command_error:{command_name}")
+        raise
+    finally:
+        metrics.observe("total", time.perf_counter() - start)
+        metrics.current_command.reset(token)
 
 # ----------------------------
 # DM helper
 # ----------------------------
 async def safe_dm(user: discord.Member, content: str):
     try:
-        await user.send(content)
+        with metrics.timed("dm"):
+            await user.send(content)
     except discord.Forbidden:
         print(f"⚠️ Could not DM user {user} (DMs closed).")
     except Exception as e:
         print(f"⚠️ Error DMing user {user}: {e}")
 
 # ----------------------------
-# Blacklist (in-memory; unchanged)
+# Blacklist (persisted in mod_logs.db, mirrored in memory per guild)
 # ----------------------------
-blacklist_items = []
-
-def get_blacklist_items():
-    return blacklist_items.copy()
-
-def add_blacklist_item(item_text: str):
-    if item_text in blacklist_items:
+class GuildBlacklist:
+    """One guild's terms, their matcher and the state of the messages rendering them."""
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.items = sorted(db.load_blacklist_items(guild_id), key=lambda s: s.lower())
+        self.matcher = BlacklistMatcher(self.items)  # rebuilt only when the list changes
+        self.shards = None       # shard index -> [PartialMessage, content hash]
+        self.update_task = None
+        self.update_pending = False  # items changed since the running update rendered them
+
+    def rebuild_matcher(self):
+        self.matcher = BlacklistMatcher(self.items)
+
+_blacklists = {}  # guild id -> GuildBlacklist, loaded on first use
+
+def get_blacklist(guild_id: int) -> GuildBlacklist:
+    blacklist = _blacklists.get(guild_id)
+    if blacklist is None:
+        blacklist = _blacklists[guild_id] = GuildBlacklist(guild_id)
+    return blacklist
+
+def get_blacklist_items(guild_id: int):
+    return get_blacklist(guild_id).items.copy()
+
+def add_blacklist_item(guild_id: int, item_text: str):
+    blacklist = get_blacklist(guild_id)
+    if item_text in blacklist.items:
         return False
-    blacklist_items.append(item_text)
-    blacklist_items.sort(key=lambda s: s.lower())  # alphabetical
+    db.insert_blacklist_item(guild_id, item_text)
+    blacklist.items.append(item_text)
+    blacklist.items.sort(key=lambda s: s.lower())  # alphabetical
+    blacklist.rebuild_matcher()
     return True
 
-def remove_blacklist_item_by_index(index: int):
-    if index < 0 or index >= len(blacklist_items):
+def remove_blacklist_item_by_index(guild_id: int, index: int):
+    blacklist = get_blacklist(guild_id)
+    if index < 0 or index >= len(blacklist.items):
         return None
-    return blacklist_items.pop(index)
+    removed = blacklist.items.pop(index)
+    db.delete_blacklist_item(guild_id, removed)
+    blacklist.rebuild_matcher()
+    return removed
 
 # ----------------------------
-# Blacklist message helpers (unchanged)
+# Blacklist enforcement
 # ----------------------------
-async def update_blacklist_message(channel: discord.TextChannel):
-    items = get_blacklist_items()
-    desc = "*(Currently empty)*" if not items else "\n".join([f"{i+1} - {w}" for i, w in enumerate(items)])
-    message = None
-    if BLACKLIST_MESSAGE_ID != 0:
-        try:
-            message = await channel.fetch_message(BLACKLIST_MESSAGE_ID)
-        except Exception:
-            message = None
+async def enforce_blacklist(message: discord.Message):
+    if message.guild is None or message.author.bot or guild_config.get(message.guild.id) is None:
+        return
+    # staff who can already manage messages are exempt (no fetch: guild_permissions is cached)
+    if isinstance(message.author, discord.Member) and message.author.guild_permissions.manage_messages:
+        return
+    hit = get_blacklist(message.guild.id).matcher.search(message.content)
+    if hit is None:
+        return
+    try:
+        await message.delete()
+    except discord.NotFound:
+        return
+    except discord.Forbidden:
+        print(f"⚠️ Missing permission to delete blacklisted message in #{message.channel}.")
+        return
+    await safe_dm(message.author, f"🚫 Your message in **{message.guild.name}** was removed because it contains a blacklisted term.")
+
+@bot.listen("on_message")
+async def blacklist_on_message(message: discord.Message):
+    await enforce_blacklist(message)
+
+@bot.listen("on_message_edit")
+async def blacklist_on_message_edit(before: discord.Message, after: discord.Message):
+    if before.content != after.content:
+        await enforce_blacklist(after)
 
-    if message is None and BLACKLIST_MESSAGE_ID == 0:
-        message = await channel.send(embed=discord.Embed(title="📝 Blacklist", description=desc, color=discord.Color.dark_theme()))
-    elif message:
+# ----------------------------
+# Blacklist message helpers
+# ----------------------------
+BLACKLIST_UPDATE_DELAY = 2.0  # seconds; changes inside this window collapse into one edit
+
+BLACKLIST_SHARD_CHARS = 4000  # embed descriptions cap at 4096
+
+def render_blacklist_shards(items) -> list:
+    """Split the numbered list into embed-sized descriptions (always at least one)."""
+    if not items:
+        return ["*(Currently empty)*"]
+    shards, lines, size = [], [], 0
+    for i, w in enumerate(items):
+        line = f"{i+1} - {w}"
+        if lines and size + len(line) + 1 > BLACKLIST_SHARD_CHARS:
+            shards.append("\n".join(lines))
+            lines, size = [], 0
+        lines.append(line)
+        size += len(line) + 1
+    shards.append("\n".join(lines))
+    return shards
+
+def _shard_hash(desc: str) -> str:
+    return hashlib.sha1(desc.encode("utf-8")).hexdigest()
+
+def _blacklist_embed(desc: str, shard: int) -> discord.Embed:
+    title = "📝 Blacklist" if shard == 0 else "📝 Blacklist (cont.)"
+    return discord.Embed(title=title, description=desc, color=discord.Color.dark_theme())
+
+def _load_blacklist_shards(channel: discord.TextChannel) -> dict:
+    stored = db.load_blacklist_shards(channel.guild.id)
+    if 0 not in stored:
+        # first run with shards: adopt the guild's single configured blacklist message as shard 0
+        config = guild_config.get(channel.guild.id)
+        if config is not None and config.blacklist_message_id:
+            stored[0] = (config.blacklist_message_id, None)
+    # editing a PartialMessage needs no fetch_message round-trip
+    return {i: [channel.get_partial_message(mid), h] for i, (mid, h) in stored.items()}
+
+async def update_blacklist_message(channel: discord.TextChannel):
+    """Re-render the guild's blacklist, editing only the shard messages whose content changed."""
+    guild_id = channel.guild.id
+    blacklist = get_blacklist(guild_id)
+    if blacklist.shards is None:
+        blacklist.shards = _load_blacklist_shards(channel)
+    shards = blacklist.shards
+
+    descs = render_blacklist_shards(get_blacklist_items(guild_id))
+    for i, desc in enumerate(descs):
+        digest = _shard_hash(desc)
+        current = shards.get(i)
+        if current is not None and current[1] == digest:
+            continue
+        embed = _blacklist_embed(desc, i)
+        message = None
+        if current is not None:
+            try:
+                message = await current[0].edit(embed=embed)
+            except discord.NotFound:
+                message = None  # deleted; post a fresh one below
+            except Exception as e:
+                print(f"⚠️ Failed to update blacklist shard {i+1}:", e)
+                continue
+        if message is None:
+            try:
+                message = await channel.send(embed=embed)
+            except Exception as e:
+                print(f"⚠️ Failed to post blacklist shard {i+1}:", e)
+                continue
+        shards[i] = [message, digest]
+        db.save_blacklist_shard(guild_id, i, message.id, digest)
+
+    # list shrank: drop the trailing shard messages
+    for i in sorted(k for k in shards if k >= len(descs)):
+        message, _ = shards.pop(i)
+        db.delete_blacklist_shard(guild_id, i)
         try:
-            await message.edit(embed=discord.Embed(title="📝 Blacklist", description=desc, color=discord.Color.dark_theme()))
+            await message.delete()
+        except discord.NotFound:
+            pass
         except Exception as e:
-            print("⚠️ Failed to update blacklist message:", e)
+            print(f"⚠️ Failed to delete blacklist shard {i+1}:", e)
+
+def schedule_blacklist_update(channel: discord.TextChannel):
+    """Debounced update_blacklist_message: a burst of adds/removes costs a single edit."""
+    blacklist = get_blacklist(channel.guild.id)
+    blacklist.update_pending = True
+    if blacklist.update_task is not None and not blacklist.update_task.done():
+        return  # the runner sees the flag, even if its edits are already in flight
+
+    async def runner():
+        while blacklist.update_pending:
+            await asyncio.sleep(BLACKLIST_UPDATE_DELAY)
+            blacklist.update_pending = False
+            await update_blacklist_message(channel)
+
+    blacklist.update_task = asyncio.create_task(runner())
 
 # ----------------------------
-# Blacklist Modals & View (unchanged)
+# Blacklist Modals & View
 # ----------------------------
 class AddItemModal(Modal, title="Add item to Blacklist"):
     item = TextInput(label="Item", placeholder="Enter item to add", required=True, max_length=200)
@@ -143,9 +476,9 @@ class AddItemModal(Modal, title="Add item to Blacklist"):
         if not item_text:
             await interaction.response.send_message("❌ Item cannot be empty.", ephemeral=True)
             return
-        success = add_blacklist_item(item_text)
+        success = add_blacklist_item(interaction.guild.id, item_text)
         if success:
-            await update_blacklist_message(self.channel)
+            schedule_blacklist_update(self.channel)
             await interaction.response.send_message(f"✅ Added **{item_text}** to blacklist.", ephemeral=True)
         else:
             await interaction.response.send_message("⚠️ That item already exists.", ephemeral=True)
@@ -161,11 +494,11 @@ class RemoveItemModal(Modal, title="Remove item from Blacklist"):
         except ValueError:
             await interaction.response.send_message("❌ Invalid number.", ephemeral=True)
             return
-        removed = remove_blacklist_item_by_index(num - 1)
+        removed = remove_blacklist_item_by_index(interaction.guild.id, num - 1)
         if removed is None:
             await interaction.response.send_message("❌ That number doesn't exist.", ephemeral=True)
         else:
-            await update_blacklist_message(self.channel)
+            schedule_blacklist_update(self.channel)
             await interaction.response.send_message(f"🗑️ Removed **{removed}** from blacklist.", ephemeral=True)
 
 class BlacklistView(View):
@@ -179,152 +512,355 @@ class BlacklistView(View):
     async def remove_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_modal(RemoveItemModal(self.channel))
 
-@bot.tree.command(name="blacklist_interface", description="Open the blacklist interface (Add / Remove items)", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="blacklist_interface", description="Open the blacklist interface (Add / Remove items)")
+@app_commands.guild_only()
 async def blacklist_interface(interaction: discord.Interaction):
     async def inner(interaction: discord.Interaction):
-        channel = interaction.guild.get_channel(BLACKLIST_CHANNEL_ID)
+        config = guild_config.get(interaction.guild.id)
+        channel = interaction.guild.get_channel(config.blacklist_channel_id) if config.blacklist_channel_id else None
         if not channel:
             await interaction.response.send_message("❌ Blacklist channel not found.", ephemeral=True)
             return
-        items = get_blacklist_items()
-        desc = "*(Currently empty)*" if not items else "\n".join([f"{i+1} - {word}" for i, word in enumerate(items)])
-        embed = discord.Embed(title="📝 Blacklist Manager", description=desc, color=discord.Color.dark_theme())
+        shards = render_blacklist_shards(get_blacklist_items(interaction.guild.id))
+        embed = discord.Embed(title="📝 Blacklist Manager", description=shards[0], color=discord.Color.dark_theme())
+        if len(shards) > 1:
+            embed.set_footer(text=f"Showing part 1/{len(shards)} — full list in #{channel.name}")
         view = BlacklistView(channel)
-        await update_blacklist_message(channel)
+        schedule_blacklist_update(channel)
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
     await run_command_with_permission(interaction, "blacklist_interface", inner)
 
 # ----------------------------
 # Message-based moderation logging
 # ----------------------------
-MODLOG_PREFIX = "__modlog__:"          # marker prefix
-SPoILER_WRAP = ("||", "||")            # invisible spoiler wrappers
-
-def _wrap_spoiler(s: str) -> str:
-    return f"{SPoILER_WRAP[0]}{s}{SPoILER_WRAP[1]}"
+MODLOG_COMPACT = False  # opt-in "__ml2__" short-key payloads; bots older than the codec can't read them
 
-def _make_modlog_content(data: dict) -> str:
+def _make_modlog_content(data) -> str:
     # returns a content string where JSON metadata is wrapped in spoilers and prefixed.
-    return _wrap_spoiler(MODLOG_PREFIX + json.dumps(data, separators=(",", ":"), ensure_ascii=False))
+    return modlog_codec.encode(data, compact=MODLOG_COMPACT)
 
 def _extract_modlog_from_content(content: str):
     """
     Given a message content, return metadata dict if present, otherwise None.
-    Accepts content where JSON is inside spoilers, possibly other text in message.
+    Accepts v1 (__modlog__:) and compact v2 (__ml2__:) payloads, inside spoilers or not.
     """
-    if not content:
-        return None
-    # Find the MODLOG_PREFIX anywhere in the content (inside spoilers or not)
-    m = re.search(re.escape(MODLOG_PREFIX) + r'(\{.*\})', content)
-    if not m:
-        # maybe content is wrapped in spoilers: remove outer ||...|| then try again
-        stripped = content
-        if stripped.startswith("||") and stripped.endswith("||"):
-            stripped = stripped[2:-2]
-            m = re.search(re.escape(MODLOG_PREFIX) + r'(\{.*\})', stripped)
-            if not m:
-                return None
-        else:
-            return None
-    try:
-        json_part = m.group(1)
-        return json.loads(json_part)
-    except Exception:
-        return None
+    return modlog_codec.decode(content)
 
-async def log_action_msg(user: discord.Member, moderator: discord.Member, action: str, reason: str, duration: int = None):
+def _extract_modlog_entries(content: str) -> list:
     """
-    Posts a modlog message in MOD_LOG_CHANNEL_ID.
-    Metadata is stored in an invisible spoiler at the start of the message:
-      ||__modlog__:{...}||
-    The visible part is a clean embed. After sending, we edit the message to include msg_id inside metadata.
+    Like _extract_modlog_from_content, but also understands batch logs (a JSON list of entries
+    in one message, posted by the bulk commands). Always returns a list of valid entries.
     """
-    channel = user.guild.get_channel(MOD_LOG_CHANNEL_ID)
-    if not channel:
-        print("⚠️ Mod log channel not found.")
-        return None
-
-    now = datetime.now(timezone.utc)
-    metadata = {
-        "user": user.id,
+    return modlog_codec.decode_entries(content)
+
+MODLOG_CONTENT_LIMIT = 2000  # Discord message content cap
+# Discord's own cap on audit log reasons; even fully JSON-escaped it leaves a single log well
+# inside the content limit (and the embed description), so a long reason can't make a post fail
+MODLOG_REASON_LIMIT = 512
+
+def _clamp_reason(reason: str) -> str:
+    reason = reason or "No reason provided"
+    return reason if len(reason) <= MODLOG_REASON_LIMIT else reason[:MODLOG_REASON_LIMIT - 1] + "…"
+
+def _modlog_embed(meta: dict, user_name: str, moderator_name: str) -> discord.Embed:
+    action, duration = meta["action"], meta.get("duration")
+    title = f"{action.title()} | {user_name}"
+    embed = discord.Embed(title=title, description=meta["reason"], color=discord.Color.red() if action in ("ban","kick","timeout") else discord.Color.orange(), timestamp=datetime.fromtimestamp(meta["timestamp"], timezone.utc))
+    embed.add_field(name="Moderator", value=f"{moderator_name} (ID: {meta['moderator']})", inline=True)
+    embed.add_field(name="User ID", value=str(meta["user"]), inline=True)
+    if duration:
+        embed.add_field(name="Duration (minutes)", value=str(duration), inline=False)
+    embed.set_footer(text=f"Log ID: {meta['log_id']}")
+    return embed
+
+def _bulk_modlog_embed(entries: list, moderator_name: str) -> discord.Embed:
+    first = entries[0]
+    embed = discord.Embed(
+        title=f"Bulk {first['action'].title()} | {len(entries)} user(s)",
+        description=first["reason"],
+        color=discord.Color.red(),
+        timestamp=datetime.fromtimestamp(first["timestamp"], timezone.utc),
+    )
+    embed.add_field(name="Moderator", value=f"{moderator_name} (ID: {first['moderator']})", inline=False)
+    embed.add_field(name="Users", value="\n".join(f"<@{m['user']}> ({m['user']}) — Log ID {m['log_id']}" for m in entries)[:1024], inline=False)
+    if first.get("duration"):
+        embed.add_field(name="Duration (minutes)", value=str(first["duration"]), inline=False)
+    return embed
+
+def _new_modlog_meta(user_id: int, moderator: discord.Member, action: str, reason: str, duration: int = None) -> dict:
+    return {
+        "user": user_id,
         "moderator": moderator.id,
         "action": action,
-        "reason": reason,
-        "timestamp": int(now.timestamp()),
+        "reason": _clamp_reason(reason),
+        "timestamp": int(datetime.now(timezone.utc).timestamp()),
         "duration": duration
     }
 
-    # Build visible embed:
-    title = f"{action.title()} | {user.display_name}"
-    embed = discord.Embed(title=title, description=reason, color=discord.Color.red() if action in ("ban","kick","timeout") else discord.Color.orange(), timestamp=now)
-    embed.add_field(name="Moderator", value=f"{moderator} (ID: {moderator.id})", inline=True)
-    embed.add_field(name="User ID", value=str(user.id), inline=True)
-    if duration:
-        embed.add_field(name="Duration (minutes)", value=str(duration), inline=False)
+async def log_action_msg(user: discord.Member, moderator: discord.Member, action: str, reason: str, duration: int = None, user_name: str = None):
+    """
+    Records a modlog entry in the moderator's guild and returns its log ID immediately.
+    The entry is committed to mod_logs.db first; the outbox worker then posts it to the guild's
+    mod log channel with the metadata in an invisible spoiler at the start of the message:
+      ||__modlog__:{...}||
+    so a Discord outage delays the post but never loses the log.
+    `user_name` stands in for user.display_name when only an id is at hand (scheduled actions).
+    """
+    metadata = _new_modlog_meta(user.id, moderator, action, reason, duration)
+    render = {"user_name": user_name or user.display_name, "moderator_name": str(moderator)}
+    log_id = db.enqueue_mod_logs(moderator.guild.id, [metadata], render)[0]
+    wake_modlog_outbox()
+    return log_id
 
-    # Send message with invisible metadata in content
-    content = _make_modlog_content(metadata)
-    try:
-        msg = await channel.send(content=content, embed=embed)
-    except Exception as e:
-        print("⚠️ Failed to send modlog message:", e)
+def _chunk_modlog_entries(entries: list) -> list:
+    """
+    Split entries into runs that each fit one batch modlog message. A user appears at most once
+    per message: the index keys entries by (msg_id, user_id).
+    """
+    # sized as v1 JSON (an upper bound for compact too), plus the log_id each entry gets on enqueue
+    id_room = len(',"log_id":') + 12
+    chunks, chunk, size, users = [], [], 0, set()
+    for meta in entries:
+        entry_size = len(json.dumps(meta, separators=(",", ":"), ensure_ascii=False)) + id_room + 1
+        if chunk and (size + entry_size > MODLOG_CONTENT_LIMIT - len(_make_modlog_content([])) or meta["user"] in users):
+            chunks.append(chunk)
+            chunk, size, users = [], 0, set()
+        chunk.append(meta)
+        size += entry_size
+        users.add(meta["user"])
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+async def log_actions_batch(guild: discord.Guild, moderator: discord.Member, action: str, reason: str, user_ids, duration: int = None):
+    """
+    Batched log_action_msg for bulk commands: entries are packed into as few modlog messages
+    as fit in the content limit (||__modlog__:[{...},{...}]||), one outbox job per message.
+    Returns {user_id: log id}.
+    """
+    entries = [_new_modlog_meta(uid, moderator, action, reason, duration) for uid in user_ids]
+    log_ids = {}
+    for chunk in _chunk_modlog_entries(entries):
+        ids = db.enqueue_mod_logs(guild.id, chunk, {"bulk": True, "moderator_name": str(moderator)})
+        log_ids.update({meta["user"]: log_id for meta, log_id in zip(chunk, ids)})
+    wake_modlog_outbox()
+    return log_ids
+
+# ----------------------------
+# Modlog outbox worker
+# ----------------------------
+OUTBOX_BATCH = 25
+OUTBOX_BACKOFF_BASE = 2.0    # seconds, doubled per failed attempt
+OUTBOX_BACKOFF_MAX = 300.0
+OUTBOX_METRICS_NAME = "modlog_outbox"  # shows up next to the commands in /stats and /metrics
+
+_outbox_wakeup = asyncio.Event()
+_outbox_task = None
+
+def wake_modlog_outbox():
+    _outbox_wakeup.set()
+
+async def _post_outbox_job(channel: discord.TextChannel, payload: dict) -> discord.Message:
+    entries = payload["entries"]
+    if payload.get("bulk"):
+        content = _make_modlog_content(entries)
+        embed = _bulk_modlog_embed(entries, payload["moderator_name"])
+    else:
+        content = _make_modlog_content(entries[0])
+        embed = _modlog_embed(entries[0], payload["user_name"], payload["moderator_name"])
+    return await channel.send(content=content, embed=embed)
+
+def _outbox_backoff(outbox_id: int, attempts: int) -> float:
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** attempts))
+    db.retry_outbox(outbox_id, attempts + 1, time.time() + delay)
+    return delay
+
+def _owned_shards():
+    """(shard_count, shard_ids) when this process runs only some shards, else None (all of them)."""
+    if SHARD_IDS is None:
         return None
+    return (bot.shard_count, tuple(SHARD_IDS))
+
+def _mod_log_channel(guild_id: int):
+    config = guild_config.get(guild_id)
+    return bot.get_channel(config.mod_log_channel_id) if config and config.mod_log_channel_id else None
+
+async def flush_modlog_outbox() -> bool:
+    """Post every due outbox job. Returns False if Discord is failing and the batch was cut short."""
+    shards = _owned_shards()
+    while True:
+        jobs = db.due_outbox(time.time(), OUTBOX_BATCH, shards)
+        if not jobs:
+            return True
+        for outbox_id, guild_id, payload, attempts in jobs:
+            # entries deleted (/warndelete) while still queued are not posted
+            alive = db.existing_log_ids(e["log_id"] for e in payload["entries"])
+            payload["entries"] = [e for e in payload["entries"] if e["log_id"] in alive]
+            if not payload["entries"]:
+                db.drop_outbox(outbox_id)
+                continue
+            channel = _mod_log_channel(guild_id)
+            if channel is None:
+                # one guild without a reachable log channel must not hold up everyone else's logs
+                delay = _outbox_backoff(outbox_id, attempts)
+                print(f"⚠️ Mod log channel for guild {guild_id} not found, retrying in {delay:.0f}s.")
+                continue
+            try:
+                with metrics.timed("post", command=OUTBOX_METRICS_NAME):
+                    msg = await _post_outbox_job(channel, payload)
+            except discord.HTTPException as e:
+                if 400 <= e.status < 500 and e.status != 429:
+                    # Discord rejected this job itself (bad payload, no access): retrying can't succeed.
+                    # The entries stay in the local index; only the channel post is given up.
+                    db.drop_outbox(outbox_id)
+                    print(f"⚠️ Modlog job {outbox_id} for guild {guild_id} rejected with HTTP {e.status}, dropping it:", e)
+                    continue
+                delay = _outbox_backoff(outbox_id, attempts)
+                print(f"⚠️ Modlog post failed (attempt {attempts + 1}), retrying in {delay:.0f}s:", e)
+                return False
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = _outbox_backoff(outbox_id, attempts)
+                print(f"⚠️ Modlog post failed (attempt {attempts + 1}), retrying in {delay:.0f}s:", e)
+                return False
+            # enqueue -> visible in the channel, including any retries
+            metrics.observe("delay", time.time() - payload["entries"][0]["timestamp"], command=OUTBOX_METRICS_NAME)
+            try:
+                db.complete_outbox(outbox_id, msg.id, alive)
+            except sqlite3.Error as e:
+                # the message is already posted: retrying would only post it again
+                db.drop_outbox(outbox_id)
+                print(f"⚠️ Modlog job {outbox_id} posted as message {msg.id} but could not be recorded, dropping it:", e)
+
+async def modlog_outbox_worker():
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        _outbox_wakeup.clear()
+        try:
+            await flush_modlog_outbox()
+        except Exception as e:
+            print("⚠️ Modlog outbox worker error:", e)
+        due = db.next_outbox_due(_owned_shards())
+        timeout = None if due is None else max(1.0, due - time.time())
+        try:
+            await asyncio.wait_for(_outbox_wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
 
-    # Update metadata with msg_id and edit content (still hidden)
-    try:
-        metadata["msg_id"] = msg.id
-        new_content = _make_modlog_content(metadata)
-        # edit embed to include message ID in footer for convenience (visible)
-        embed.set_footer(text=f"Message ID: {msg.id}")
-        await msg.edit(content=new_content, embed=embed)
-    except Exception as e:
-        print("⚠️ Failed to update modlog message:", e)
-    return msg.id
+@bot.listen("on_ready")
+async def modlog_outbox_on_ready():
+    global _outbox_task
+    if _outbox_task is None or _outbox_task.done():
+        _outbox_task = asyncio.create_task(modlog_outbox_worker())
 
 # ----------------------------
-# Fetch logs from mod channel (no DB)
+# Mod log channel sync (backfill once, then catch up from a high-water mark)
 # ----------------------------
-async def fetch_mod_logs(user: discord.Member, only_warns=False, lookback_limit=1000):
-    channel = user.guild.get_channel(MOD_LOG_CHANNEL_ID)
-    if not channel:
-        return []
-    logs = []
-    # iterate history (newest first) — accumulate up to lookback_limit messages checked
-    checked = 0
-    async for msg in channel.history(limit=None):
-        checked += 1
-        if checked > lookback_limit:
-            break
-        meta = _extract_modlog_from_content(msg.content)
-        if not meta:
-            continue
-        # filter by user
-        if meta.get("user") != user.id:
-            continue
-        # filter warns / non-warns
-        if only_warns and meta.get("action") != "warn":
-            continue
-        if (not only_warns) and meta.get("action") == "warn":
-            continue
-        # ensure msg_id present
-        meta["msg_id"] = meta.get("msg_id", msg.id)
-        logs.append(meta)
-    # sort newest -> oldest by timestamp (some messages could be out of order)
-    logs.sort(key=lambda d: d.get("timestamp", 0), reverse=True)
-    return logs
+MODLOG_SYNC_KEY = "modlog_hwm"  # per guild: "modlog_hwm:<guild id>"
+MODLOG_SYNC_BATCH = 100  # one history page per local transaction
+
+_modlog_sync_locks = {}  # guild id -> asyncio.Lock
+_modlog_synced = set()   # guilds whose backfill finished; live indexing starts after that
+
+async def sync_mod_log_channel(guild: discord.Guild):
+    """
+    Index every modlog message in the guild's log channel posted after its high-water mark.
+    First run backfills the whole channel (oldest -> newest); every later run only pages
+    through history(after=hwm). The hwm is committed with each batch so an interrupted
+    backfill resumes where it stopped.
+    """
+    lock = _modlog_sync_locks.setdefault(guild.id, asyncio.Lock())
+    async with lock:
+        channel = _mod_log_channel(guild.id)
+        if channel is None:
+            print(f"⚠️ Mod log channel for guild {guild.id} not found, skipping modlog sync.")
+            return
+        key = f"{MODLOG_SYNC_KEY}:{guild.id}"
+        hwm = int(db.get_state(key, 0))
+        after = discord.Object(id=hwm) if hwm else None
+        batch, last_id, indexed = [], hwm, 0
+        async for msg in channel.history(limit=None, after=after, oldest_first=True):
+            last_id = msg.id
+            batch.extend((meta, msg.id) for meta in _extract_modlog_entries(msg.content))
+            if len(batch) >= MODLOG_SYNC_BATCH:
+                db.upsert_mod_logs(guild.id, batch, state={key: last_id})
+                indexed += len(batch)
+                batch = []
+        if last_id != hwm:
+            db.upsert_mod_logs(guild.id, batch, state={key: last_id})
+            indexed += len(batch)
+        _modlog_synced.add(guild.id)
+        print(f"✅ Modlog index synced for guild {guild.id} ({indexed} new entries, hwm={last_id})")
+
+@bot.listen("on_ready")
+async def modlog_sync_on_ready():
+    # on_ready also fires after reconnects; the sync is incremental so re-running is cheap
+    for guild in bot.guilds:
+        if guild_config.get(guild.id) is not None:
+            await sync_mod_log_channel(guild)
+
+def _is_mod_log_channel(guild_id: int, channel_id: int) -> bool:
+    config = guild_config.get(guild_id) if guild_id else None
+    return config is not None and config.mod_log_channel_id == channel_id
+
+@bot.listen("on_message")
+async def modlog_index_on_message(message: discord.Message):
+    # keep the index and hwm current while running so the next restart has nothing to catch up on
+    if message.guild is None or message.guild.id not in _modlog_synced or not _is_mod_log_channel(message.guild.id, message.channel.id):
+        return
+    entries = _extract_modlog_entries(message.content)
+    if entries:
+        db.upsert_mod_logs(message.guild.id, [(meta, message.id) for meta in entries],
+                           state={f"{MODLOG_SYNC_KEY}:{message.guild.id}": message.id})
+
+@bot.listen("on_raw_message_delete")
+async def modlog_on_delete(payload: discord.RawMessageDeleteEvent):
+    if _is_mod_log_channel(payload.guild_id, payload.channel_id):
+        db.delete_mod_log(payload.message_id)
+
+@bot.listen("on_raw_bulk_message_delete")
+async def modlog_on_bulk_delete(payload: discord.RawBulkMessageDeleteEvent):
+    if _is_mod_log_channel(payload.guild_id, payload.channel_id):
+        db.delete_mod_logs(payload.message_ids)
 
 # ----------------------------
-# LogView (pagination) - 5 per page, newest -> oldest
+# LogView (pagination) - 5 per page, newest -> oldest, pages pulled on demand
 # ----------------------------
+class ModLogCursor:
+    """Keyset cursor over one member's logs in the local index; pages are keyed by (timestamp, log_id)."""
+    def __init__(self, guild_id: int, user_id: int, only_warns: bool = False):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.only_warns = only_warns
+
+    def count(self) -> int:
+        return db.count_mod_logs(self.guild_id, self.user_id, self.only_warns)
+
+    async def page(self, limit: int, after=None, before=None, oldest: bool = False) -> list:
+        return db.page_mod_logs(self.guild_id, self.user_id, self.only_warns, limit, after=after, before=before, oldest=oldest)
+
+    @staticmethod
+    def key(entry: dict):
+        return (entry["timestamp"], entry["log_id"])
+
 class LogView(View):
-    def __init__(self, entries, member, interaction):
+    """
+    Holds only the current page plus one prefetched neighbour, so time-to-first-page and
+    memory per open view don't depend on how long the member's history is.
+    """
+    per_page = 5
+
+    def __init__(self, cursor, member, interaction, title: str = None):
         super().__init__(timeout=180)
-        self.entries = entries
+        self.cursor = cursor
         self.member = member
         self.interaction = interaction
+        self.title = title or f"Logs for {member.display_name}"
         self.index = 0
-        self.per_page = 5
-        self.max_index = max(0, (len(entries)-1)//self.per_page)
+        self.total = cursor.count()
+        self.max_index = max(0, (self.total-1)//self.per_page)
+        self.page_entries = []
+        self._prefetch = None  # (page index, entries)
+        self._prefetch_task = None
 
         # create buttons and assign callbacks
         self.first_button = Button(label="⏮️ First", style=discord.ButtonStyle.gray)
@@ -340,173 +876,1112 @@ class LogView(View):
         self.next_button.callback = self.next_page
         self.last_button.callback = self.last_page
 
+    async def _load_page(self, index: int):
+        if self._prefetch_task is not None:
+            self._prefetch_task.cancel()
+        if index == self.index and self.page_entries:
+            entries = self.page_entries
+        elif self._prefetch is not None and self._prefetch[0] == index:
+            entries = self._prefetch[1]
+        elif index == 0:
+            entries = await self.cursor.page(self.per_page)
+        elif index == self.max_index:
+            entries = await self.cursor.page(self.total - self.max_index * self.per_page, oldest=True)
+        elif index == self.index + 1 and self.page_entries:
+            entries = await self.cursor.page(self.per_page, after=self.cursor.key(self.page_entries[-1]))
+        elif index == self.index - 1 and self.page_entries:
+            entries = await self.cursor.page(self.per_page, before=self.cursor.key(self.page_entries[0]))
+        else:
+            entries = []
+        direction = 1 if index >= self.index else -1
+        self.index, self.page_entries, self._prefetch = index, entries, None
+        self._start_prefetch(direction)
+
+    def _start_prefetch(self, direction: int):
+        target = self.index + direction
+        if not self.page_entries or target < 0 or target > self.max_index:
+            return
+
+        async def prefetch():
+            if direction > 0:
+                entries = await self.cursor.page(self.per_page, after=self.cursor.key(self.page_entries[-1]))
+            else:
+                entries = await self.cursor.page(self.per_page, before=self.cursor.key(self.page_entries[0]))
+            self._prefetch = (target, entries)
+
+        self._prefetch_task = asyncio.create_task(prefetch())
+
+    def format_entry(self, e: dict) -> str:
+        ts = f"<t:{e['timestamp']}:f>" if e.get("timestamp") else "Unknown time"
+        duration = f" ({e['duration']} min)" if e.get("duration") else ""
+        return (
+            f"**{e['action'].title()}**{duration} — Moderator: <@{e['moderator']}> — Time: {ts}\n"
+            f"Reason: {e.get('reason','No reason')}\nLog ID: `{e.get('log_id')}`"
+        )
+
     def get_page_embed(self):
-        start = self.index * self.per_page
-        end = start + self.per_page
-        page_entries = self.entries[start:end]
-        if not page_entries:
+        if not self.page_entries:
             desc = "No entries on this page."
         else:
-            parts = []
-            for e in page_entries:
-                ts = f"<t:{e['timestamp']}:f>" if e.get("timestamp") else "Unknown time"
-                duration = f" ({e['duration']} min)" if e.get("duration") else ""
-                parts.append(
-                    f"**{e['action'].title()}**{duration} — Moderator: <@{e['moderator']}> — Time: {ts}\n"
-                    f"Reason: {e.get('reason','No reason')}\nMessage ID: `{e.get('msg_id')}`"
-                )
-            desc = "\n\n".join(parts)
-        embed = discord.Embed(title=f"Logs for {self.member.display_name}", description=desc, color=discord.Color.dark_theme())
-        embed.set_footer(text=f"Page {self.index+1}/{self.max_index+1} — {len(self.entries)} entries total")
+            desc = "\n\n".join(self.format_entry(e) for e in self.page_entries)
+        embed = discord.Embed(title=self.title, description=desc, color=discord.Color.dark_theme())
+        embed.set_footer(text=f"Page {self.index+1}/{self.max_index+1} — {self.total} entries total")
         return embed
 
     async def send_initial(self):
+        await self._load_page(0)
         await self.interaction.response.send_message(embed=self.get_page_embed(), view=self, ephemeral=True)
 
     async def update_message(self, interaction: discord.Interaction):
         await interaction.response.edit_message(embed=self.get_page_embed(), view=self)
 
     async def first_page(self, interaction: discord.Interaction):
-        self.index = 0
+        await self._load_page(0)
         await self.update_message(interaction)
 
     async def prev_page(self, interaction: discord.Interaction):
-        self.index = max(0, self.index - 1)
+        await self._load_page(max(0, self.index - 1))
         await self.update_message(interaction)
 
     async def next_page(self, interaction: discord.Interaction):
-        self.index = min(self.max_index, self.index + 1)
+        await self._load_page(min(self.max_index, self.index + 1))
         await self.update_message(interaction)
 
     async def last_page(self, interaction: discord.Interaction):
-        self.index = self.max_index
+        await self._load_page(self.max_index)
         await self.update_message(interaction)
 
+    async def on_timeout(self):
+        self.page_entries, self._prefetch = [], None
+
+# ----------------------------
+# Moderation stats (served from the day-bucket rollups in mod_stats_daily)
+# ----------------------------
+STATS_ACTIONS = Literal["warn", "timeout", "kick", "ban", "tempban", "unban"]
+
+class ModStatsCursor:
+    """Offset cursor over a ranking of users or moderators; pages are keyed by rank."""
+    def __init__(self, guild_id: int, kind: str, first_day: int, last_day: int, action: str = None):
+        self.guild_id = guild_id
+        self.kind = kind
+        self.first_day = first_day
+        self.last_day = last_day
+        self.action = action
+        self._total = None
+
+    def count(self) -> int:
+        self._total = db.count_mod_stats_subjects(self.guild_id, self.kind, self.first_day, self.last_day, self.action)
+        return self._total
+
+    async def page(self, limit: int, after=None, before=None, oldest: bool = False) -> list:
+        if after is not None:
+            offset = after + 1
+        elif before is not None:
+            offset, limit = max(0, before - limit), min(limit, before)
+        elif oldest:
+            offset = max(0, self._total - limit)
+        else:
+            offset = 0
+        rows = db.top_mod_stats(self.guild_id, self.kind, self.first_day, self.last_day, self.action, limit, offset)
+        for rank, row in enumerate(rows, offset):
+            row["rank"] = rank
+        return rows
+
+    @staticmethod
+    def key(entry: dict):
+        return entry["rank"]
+
+class ModStatsView(LogView):
+    per_page = 10
+
+    def __init__(self, cursor: ModStatsCursor, interaction, title: str, totals: dict):
+        super().__init__(cursor, None, interaction, title=title)
+        self.totals = totals
+
+    def format_entry(self, e: dict) -> str:
+        actions = " · ".join(f"{action} {n}" for action, n in sorted(e["actions"].items(), key=lambda kv: -kv[1]))
+        return f"**{e['rank'] + 1}.** <@{e['subject']}> — **{e['total']}** ({actions})"
+
+    def get_page_embed(self):
+        embed = super().get_page_embed()
+        totals = " · ".join(f"{action} {n}" for action, n in self.totals.items())
+        embed.add_field(name="All actions in range", value=totals or "None", inline=False)
+        return embed
+
+# ----------------------------
+# Moderation action pipeline
+# ----------------------------
+async def run_mod_action(interaction: discord.Interaction, member: discord.Member, action: str, reason: str, *,
+                         apply=None, duration: int = None, dm=None, done=None, failed: str = None, ephemeral: bool = False):
+    """
+    Shared flow for /kick, /ban, /timeout and /warn:
+      defer -> Discord action (`apply()`) -> local modlog entry -> DM + followup concurrently.
+    `dm` and `done` are callables taking the log ID and returning the message text.
+    Deferring first means the 3-second interaction deadline no longer depends on REST latency,
+    and the channel post happens in the outbox worker, off the command's critical path.
+    """
+    with metrics.timed("ack"):
+        await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+    if apply is not None:
+        try:
+            with metrics.timed("action"):
+                await apply()
+        except discord.Forbidden:
+            await interaction.followup.send(failed, ephemeral=True)
+            return None
+        except discord.HTTPException as e:
+            # already deferred: without a followup the interaction would stay on "thinking…"
+            await interaction.followup.send(f"{failed} ({e.text or f'HTTP {e.status}'})", ephemeral=True)
+            return None
+    # local commit only; the channel post is timed by the outbox worker (modlog_outbox / post)
+    with metrics.timed("log_commit"):
+        log_id = await log_action_msg(member, interaction.user, action, reason, duration)
+
+    async def respond():
+        with metrics.timed("response"):
+            await interaction.followup.send(done(log_id), ephemeral=ephemeral)
+
+    await asyncio.gather(safe_dm(member, dm(log_id)), respond())
+    return log_id
+
+# ----------------------------
+# Scheduled actions (temp bans, temp roles, timeouts past Discord's 28-day cap)
+# ----------------------------
+MAX_NATIVE_TIMEOUT = timedelta(days=28)  # Discord rejects longer communication timeouts
+MAX_DURATION_MINUTES = 5 * 365 * 24 * 60  # cap on duration options (~5 years); keeps utcnow() + timedelta in range
+TIMEOUT_REFRESH_MARGIN = 3600            # seconds before a native timeout lapses that it is re-applied
+
+_scheduler_task = None
+
+def _scheduled_guild(job: dict) -> discord.Guild:
+    guild = bot.get_guild(job["guild_id"])
+    if guild is None:
+        raise LookupError("bot is no longer in the guild")
+    return guild
+
+async def _scheduled_member(job: dict) -> discord.Member:
+    guild = _scheduled_guild(job)
+    member = (await member_cache.fetch_members(guild, [job["user_id"]], member_lru)).get(job["user_id"])
+    if member is None:
+        raise LookupError("member left the guild")
+    return member
+
+async def expire_tempban(job: dict):
+    guild = _scheduled_guild(job)
+    await guild.unban(discord.Object(id=job["user_id"]), reason="Temporary ban expired")
+    await log_action_msg(discord.Object(id=job["user_id"]), guild.me, "unban", "Temporary ban expired",
+                         user_name=job["payload"].get("user_name"))
+
+async def expire_temprole(job: dict):
+    member = await _scheduled_member(job)
+    role = member.guild.get_role(job["payload"]["role_id"])
+    if role is None:
+        raise LookupError("role was deleted")
+    await member.remove_roles(role, reason="Temporary role expired")
+    await log_action_msg(member, member.guild.me, "role removal", f"Temporary role {role.name} expired")
+
+def schedule_timeout_refresh(member: discord.Member, native_until: datetime, until: datetime, reason: str):
+    scheduled_actions.schedule(member.guild.id, member.id, "timeout", native_until.timestamp() - TIMEOUT_REFRESH_MARGIN,
+                               {"until": until.timestamp(), "native_until": native_until.timestamp(), "reason": reason})
+
+async def refresh_timeout(job: dict):
+    """Re-apply a timeout longer than Discord allows, one <=28-day stretch at a time."""
+    member = await _scheduled_member(job)
+    native_end = job["payload"].get("native_until")
+    if not member.is_timed_out() and native_end is not None and time.time() < native_end:
+        # lifted by hand before the stretch ran out (on_member_update misses members outside the
+        # cache); a stretch that already lapsed (bot down, retries past the margin) is re-applied
+        return
+    until = datetime.fromtimestamp(job["payload"]["until"], timezone.utc)
+    native_until = min(until, discord.utils.utcnow() + MAX_NATIVE_TIMEOUT)
+    if native_until <= discord.utils.utcnow():
+        return
+    await member.timeout(native_until, reason=job["payload"].get("reason"))
+    if native_until < until:
+        schedule_timeout_refresh(member, native_until, until, job["payload"].get("reason"))
+
+async def apply_timeout(member: discord.Member, until: datetime, reason: str):
+    """Time the member out until `until`, even past Discord's cap (re-applied by the scheduler)."""
+    native_until = min(until, discord.utils.utcnow() + MAX_NATIVE_TIMEOUT)
+    await member.timeout(native_until, reason=reason)
+    scheduled_actions.cancel(member.guild.id, member.id, "timeout")
+    if native_until < until:
+        schedule_timeout_refresh(member, native_until, until, reason)
+
+async def apply_tempban(member: discord.Member, until: datetime, reason: str):
+    await member.ban(reason=reason)
+    scheduled_actions.cancel(member.guild.id, member.id, "unban")
+    scheduled_actions.schedule(member.guild.id, member.id, "unban", until.timestamp(), {"user_name": member.display_name})
+
+scheduled_actions = scheduler.Scheduler({
+    "unban": expire_tempban,
+    "remove_role": expire_temprole,
+    "timeout": refresh_timeout,
+})
+
+@bot.listen("on_ready")
+async def scheduler_on_ready():
+    global _scheduler_task
+    if not scheduled_actions.loaded:
+        scheduled_actions.load(_owned_shards())
+    if _scheduler_task is None or _scheduler_task.done():
+        _scheduler_task = asyncio.create_task(scheduled_actions.run())
+
+@bot.listen("on_member_unban")
+async def scheduler_on_unban(guild: discord.Guild, user: discord.User):
+    # unbanned early by hand: nothing left to expire
+    scheduled_actions.cancel(guild.id, user.id, "unban")
+
+@bot.listen("on_member_update")
+async def scheduler_on_member_update(before: discord.Member, after: discord.Member):
+    # timeout lifted early by hand: don't re-apply it at the next refresh
+    if before.timed_out_until is not None and after.timed_out_until is None:
+        scheduled_actions.cancel(after.guild.id, after.id, "timeout")
+
+# ----------------------------
+# Audit log reconciliation (bans, kicks and timeouts done outside the bot)
+# ----------------------------
+# Member ban/kick/timeout events mark a guild dirty; the reconciler then pages its audit log
+# forward from a per-guild cursor (audit entry ids are snowflakes), so a poll costs one request
+# per 100 new entries and nothing at all for quiet guilds. A slow sweep covers events missed
+# while disconnected or for members outside the lazy cache.
+AUDIT_CURSOR_KEY = "audit_cursor"  # per guild: "audit_cursor:<guild id>" -> last audit entry id seen
+AUDIT_POLL_DELAY = 30               # seconds; events in a burst are reconciled together
+AUDIT_SWEEP_INTERVAL = 3600         # every configured guild is re-checked this often
+AUDIT_DEDUPE_SLACK = 120            # seconds between a logged action and its audit entry that still count as the same
+
+_AUDIT_ACTIONS = {
+    discord.AuditLogAction.ban: "ban",
+    discord.AuditLogAction.unban: "unban",
+    discord.AuditLogAction.kick: "kick",
+    discord.AuditLogAction.member_update: "timeout",
+}
+
+_audit_dirty = set()
+_audit_wakeup = asyncio.Event()
+_audit_task = None
+
+def mark_audit_dirty(guild_id: int):
+    if guild_config.get(guild_id) is not None:
+        _audit_dirty.add(guild_id)
+        _audit_wakeup.set()
+
+def _audit_entry_meta(entry: discord.AuditLogEntry):
+    """Modlog metadata for an audit entry we log, or None."""
+    action = _AUDIT_ACTIONS.get(entry.action)
+    if action is None or entry.target is None:
+        return None
+    duration = None
+    if action == "timeout":
+        until = getattr(entry.after, "timed_out_until", None)
+        if until is None:
+            return None  # some other member edit, or a timeout being lifted
+        duration = max(1, round((until - entry.created_at).total_seconds() / 60))
+    return {
+        "user": entry.target.id,
+        "moderator": entry.user_id or 0,
+        "action": action,
+        "reason": _clamp_reason(entry.reason),
+        "timestamp": int(entry.created_at.timestamp()),
+        "duration": duration,
+    }
+
+async def reconcile_audit_log(guild: discord.Guild) -> int:
+    """Log the guild's new audit entries that didn't come from the bot. Returns how many were logged."""
+    if guild.me is None or not guild.me.guild_permissions.view_audit_log:
+        return 0
+    key = f"{AUDIT_CURSOR_KEY}:{guild.id}"
+    cursor = int(db.get_state(key, 0))
+    if not cursor:
+        # first run: start from now rather than importing the audit log's whole retention window
+        cursor = discord.utils.time_snowflake(discord.utils.utcnow())
+        async for entry in guild.audit_logs(limit=1):
+            cursor = entry.id
+        db.set_state(key, cursor)
+        return 0
+
+    groups = {}  # (action, moderator, reason, duration) -> [meta]
+    user_names, moderator_names, last = {}, {}, cursor
+    async for entry in guild.audit_logs(limit=None, after=discord.Object(id=cursor), oldest_first=True):
+        last = entry.id
+        if entry.user_id == bot.user.id:
+            continue  # the bot's own actions are logged when it takes them
+        meta = _audit_entry_meta(entry)
+        # also catches entries a previous run logged but crashed before moving the cursor
+        if meta is None or db.mod_log_exists_near(guild.id, meta["user"], meta["action"], meta["reason"],
+                                                  meta["timestamp"], AUDIT_DEDUPE_SLACK):
+            continue
+        groups.setdefault((meta["action"], meta["moderator"], meta["reason"], meta["duration"]), []).append(meta)
+        user_names[meta["user"]] = getattr(entry.target, "display_name", None) or str(meta["user"])
+        moderator_names[meta["moderator"]] = str(entry.user) if entry.user else "Unknown"
+
+    logged = 0
+    for (_, moderator_id, _, _), entries in groups.items():
+        moderator_name = moderator_names[moderator_id]
+        # same moderator, action and reason: coalesced into batch messages like a bulk command
+        for chunk in _chunk_modlog_entries(entries):
+            if len(chunk) == 1:
+                render = {"user_name": user_names[chunk[0]["user"]], "moderator_name": moderator_name}
+            else:
+                render = {"bulk": True, "moderator_name": moderator_name}
+            db.enqueue_mod_logs(guild.id, chunk, render)
+            logged += len(chunk)
+    if last != cursor:
+        db.set_state(key, last)
+    if logged:
+        wake_modlog_outbox()
+    return logged
+
+async def audit_reconcile_worker():
+    await bot.wait_until_ready()
+    next_sweep = 0
+    while not bot.is_closed():
+        if time.time() >= next_sweep:
+            _audit_dirty.update(g.id for g in bot.guilds if guild_config.get(g.id) is not None)
+            next_sweep = time.time() + AUDIT_SWEEP_INTERVAL
+        dirty = list(_audit_dirty)
+        _audit_dirty.clear()
+        for guild_id in dirty:
+            guild = bot.get_guild(guild_id)
+            if guild is None:
+                continue
+            try:
+                logged = await reconcile_audit_log(guild)
+            except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                _audit_dirty.add(guild_id)  # try again next round
+                print(f"⚠️ Audit log reconcile failed for guild {guild_id}:", e)
+                continue
+            if logged:
+                print(f"✅ Logged {logged} action(s) taken outside the bot in guild {guild_id}")
+        _audit_wakeup.clear()
+        try:
+            await asyncio.wait_for(_audit_wakeup.wait(), timeout=max(1.0, next_sweep - time.time()))
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.sleep(AUDIT_POLL_DELAY)
+
+@bot.listen("on_ready")
+async def audit_reconcile_on_ready():
+    global _audit_task
+    if _audit_task is None or _audit_task.done():
+        _audit_task = asyncio.create_task(audit_reconcile_worker())
+
+@bot.listen("on_member_ban")
+async def audit_on_member_ban(guild: discord.Guild, user):
+    mark_audit_dirty(guild.id)
+
+@bot.listen("on_member_unban")
+async def audit_on_member_unban(guild: discord.Guild, user: discord.User):
+    mark_audit_dirty(guild.id)
+
+@bot.listen("on_raw_member_remove")
+async def audit_on_raw_member_remove(payload: discord.RawMemberRemoveEvent):
+    # kicks arrive as plain member removals
+    mark_audit_dirty(payload.guild_id)
+
+@bot.listen("on_member_update")
+async def audit_on_member_update(before: discord.Member, after: discord.Member):
+    if before.timed_out_until != after.timed_out_until:
+        mark_audit_dirty(after.guild.id)
+
+# ----------------------------
+# Warn escalation (rules per guild, evaluated from in-memory warn windows)
+# ----------------------------
+warn_windows = escalation.WarnWindows()
+_warn_windows_seeded = set()
+
+def seed_warn_windows(guild_id: int):
+    """Load the warns inside the guild's longest rule window; one indexed range scan per guild."""
+    config = guild_config.get(guild_id)
+    warn_windows.forget_guild(guild_id)
+    keep = escalation.horizon(config.escalation_rules) if config else 0
+    if keep:
+        warn_windows.seed(guild_id, db.recent_actions(guild_id, "warn", time.time() - keep))
+    _warn_windows_seeded.add(guild_id)
+
+@bot.listen("on_ready")
+async def escalation_on_ready():
+    for guild in bot.guilds:
+        if guild.id not in _warn_windows_seeded and guild_config.get(guild.id) is not None:
+            seed_warn_windows(guild.id)
+
+async def apply_escalation(member: discord.Member, rule: escalation.EscalationRule, reason: str):
+    until = discord.utils.utcnow() + timedelta(minutes=rule.duration or 0)
+    if rule.action == "timeout":
+        await apply_timeout(member, until, reason)
+    elif rule.action == "tempban":
+        await apply_tempban(member, until, reason)
+    elif rule.action == "ban":
+        await member.ban(reason=reason)
+        scheduled_actions.cancel(member.guild.id, member.id, "unban")
+    elif rule.action == "kick":
+        await member.kick(reason=reason)
+
+async def escalate_after_warn(interaction: discord.Interaction, member: discord.Member, log_id: int):
+    """Count the new warn and apply the strictest rule it completes; logged like any other action."""
+    guild = interaction.guild
+    rules = guild_config.get(guild.id).escalation_rules
+    if not rules:
+        return
+    ts = db.get_mod_log(log_id)["timestamp"]
+    if guild.id in _warn_windows_seeded:
+        warn_windows.add(guild.id, member.id, ts, escalation.horizon(rules))
+    else:
+        seed_warn_windows(guild.id)  # already includes this warn
+    rule, count = escalation.match(rules, warn_windows, guild.id, member.id, ts)
+    if rule is None:
+        return
+    reason = f"Automatic escalation: {count} warns ({rule.describe()})"
+    try:
+        with metrics.timed("escalation"):
+            await apply_escalation(member, rule, reason)
+    except discord.HTTPException as e:
+        await interaction.followup.send(f"⚠️ Escalation ({rule.describe()}) failed: {e.text or e}", ephemeral=True)
+        return
+    log_id = await log_action_msg(member, guild.me, rule.action, reason, rule.duration)
+    await asyncio.gather(
+        safe_dm(member, f"⛔ You received an automatic **{rule.action}** in **{guild.name}** after {count} warnings.\nLog ID: `{log_id}`"),
+        interaction.followup.send(f"⬆️ {member.mention} escalated: {rule.describe()}. Log ID: `{log_id}`", ephemeral=True),
+    )
+
 # ----------------------------
 # Moderation commands (log via mod channel messages)
 # ----------------------------
-@bot.tree.command(name="kick", description="Kick a member", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="kick", description="Kick a member")
+@app_commands.guild_only()
 @app_commands.describe(member="Member", reason="Reason")
 async def kick(interaction: discord.Interaction, member: discord.Member, reason: str="No reason provided"):
     async def func(interaction, member, reason):
-        try:
-            await member.kick(reason=reason)
-            msg_id = await log_action_msg(member, interaction.user, "kick", reason)
-            await safe_dm(member, f"🚨 You were kicked from **{interaction.guild.name}** by {interaction.user}. Reason: {reason}\nLog ID: `{msg_id}`")
-            await interaction.response.send_message(f"👢 {member.mention} was kicked. Log ID: `{msg_id}`")
-        except discord.Forbidden:
-            await interaction.response.send_message("❌ Cannot kick this member.", ephemeral=True)
+        await run_mod_action(
+            interaction, member, "kick", reason,
+            apply=lambda: member.kick(reason=reason),
+            dm=lambda msg_id: f"🚨 You were kicked from **{interaction.guild.name}** by {interaction.user}. Reason: {reason}\nLog ID: `{msg_id}`",
+            done=lambda msg_id: f"👢 {member.mention} was kicked. Log ID: `{msg_id}`",
+            failed="❌ Cannot kick this member.",
+        )
     await run_command_with_permission(interaction, "kick", func, member, reason)
 
-@bot.tree.command(name="ban", description="Ban a member", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="ban", description="Ban a member")
+@app_commands.guild_only()
 @app_commands.describe(member="Member", reason="Reason")
 async def ban(interaction: discord.Interaction, member: discord.Member, reason: str="No reason provided"):
     async def func(interaction, member, reason):
-        try:
-            await member.ban(reason=reason)
-            msg_id = await log_action_msg(member, interaction.user, "ban", reason)
-            await safe_dm(member, f"🚨 You were banned from **{interaction.guild.name}** by {interaction.user}. Reason: {reason}\nLog ID: `{msg_id}`")
-            await interaction.response.send_message(f"🔨 {member.mention} was banned. Log ID: `{msg_id}`")
-        except discord.Forbidden:
-            await interaction.response.send_message("❌ Cannot ban this member.", ephemeral=True)
+        await run_mod_action(
+            interaction, member, "ban", reason,
+            apply=lambda: member.ban(reason=reason),
+            dm=lambda msg_id: f"🚨 You were banned from **{interaction.guild.name}** by {interaction.user}. Reason: {reason}\nLog ID: `{msg_id}`",
+            done=lambda msg_id: f"🔨 {member.mention} was banned. Log ID: `{msg_id}`",
+            failed="❌ Cannot ban this member.",
+        )
+        # a permanent ban replaces any running temp ban
+        scheduled_actions.cancel(interaction.guild.id, member.id, "unban")
     await run_command_with_permission(interaction, "ban", func, member, reason)
 
-@bot.tree.command(name="timeout", description="Timeout a member", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="tempban", description="Ban a member for a limited time")
+@app_commands.guild_only()
 @app_commands.describe(member="Member", duration="In minutes", reason="Reason")
-async def timeout(interaction: discord.Interaction, member: discord.Member, duration: int, reason: str="No reason provided"):
+async def tempban(interaction: discord.Interaction, member: discord.Member, duration: app_commands.Range[int, 1, MAX_DURATION_MINUTES], reason: str="No reason provided"):
     async def func(interaction, member, duration, reason):
-        try:
-            until = discord.utils.utcnow() + timedelta(minutes=duration)
-            await member.timeout(until, reason=reason)
-            msg_id = await log_action_msg(member, interaction.user, "timeout", reason, duration)
-            await safe_dm(member, f"⏱️ You were timed out for {duration} minutes in **{interaction.guild.name}**. Reason: {reason}\nLog ID: `{msg_id}`\nEnds: <t:{int(until.timestamp())}:f>")
-            await interaction.response.send_message(f"⏱️ {member.mention} timed out for {duration} minute(s). Log ID: `{msg_id}`", ephemeral=True)
-        except discord.Forbidden:
-            await interaction.response.send_message("❌ Cannot timeout this member.", ephemeral=True)
+        until = discord.utils.utcnow() + timedelta(minutes=duration)
+        await run_mod_action(
+            interaction, member, "tempban", reason, duration=duration,
+            apply=lambda: apply_tempban(member, until, reason),
+            dm=lambda msg_id: f"🚨 You were banned from **{interaction.guild.name}** for {duration} minutes by {interaction.user}. Reason: {reason}\nLog ID: `{msg_id}`\nEnds: <t:{int(until.timestamp())}:f>",
+            done=lambda msg_id: f"🔨 {member.mention} was banned until <t:{int(until.timestamp())}:f>. Log ID: `{msg_id}`",
+            failed="❌ Cannot ban this member.",
+        )
+    await run_command_with_permission(interaction, "tempban", func, member, duration, reason)
+
+@bot.tree.command(name="timeout", description="Timeout a member")
+@app_commands.guild_only()
+@app_commands.describe(member="Member", duration="In minutes", reason="Reason")
+async def timeout(interaction: discord.Interaction, member: discord.Member, duration: app_commands.Range[int, 1, MAX_DURATION_MINUTES], reason: str="No reason provided"):
+    async def func(interaction, member, duration, reason):
+        until = discord.utils.utcnow() + timedelta(minutes=duration)
+        await run_mod_action(
+            interaction, member, "timeout", reason, duration=duration,
+            apply=lambda: apply_timeout(member, until, reason),
+            dm=lambda msg_id: f"⏱️ You were timed out for {duration} minutes in **{interaction.guild.name}**. Reason: {reason}\nLog ID: `{msg_id}`\nEnds: <t:{int(until.timestamp())}:f>",
+            done=lambda msg_id: f"⏱️ {member.mention} timed out for {duration} minute(s). Log ID: `{msg_id}`",
+            failed="❌ Cannot timeout this member.",
+            ephemeral=True,
+        )
     await run_command_with_permission(interaction, "timeout", func, member, duration, reason)
 
-@bot.tree.command(name="warn", description="Warn a member", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="temprole", description="Give a member a role for a limited time")
+@app_commands.guild_only()
+@app_commands.describe(member="Member", role="Role to give", duration="In minutes", reason="Reason")
+async def temprole(interaction: discord.Interaction, member: discord.Member, role: discord.Role, duration: app_commands.Range[int, 1, MAX_DURATION_MINUTES], reason: str="No reason provided"):
+    async def func(interaction, member, role, duration, reason):
+        # moderators can't hand out roles at or above their own
+        if role >= interaction.user.top_role and interaction.user.id != interaction.guild.owner_id:
+            await interaction.response.send_message("❌ You can only give roles below your highest role.", ephemeral=True)
+            return
+        until = discord.utils.utcnow() + timedelta(minutes=duration)
+
+        async def apply():
+            await member.add_roles(role, reason=reason)
+            scheduled_actions.schedule(interaction.guild.id, member.id, "remove_role", until.timestamp(), {"role_id": role.id})
+
+        await run_mod_action(
+            interaction, member, "temprole", f"{reason} (role: {role.name})", duration=duration,
+            apply=apply,
+            dm=lambda msg_id: f"🎭 You were given **{role.name}** in **{interaction.guild.name}** for {duration} minutes. Reason: {reason}\nLog ID: `{msg_id}`",
+            done=lambda msg_id: f"🎭 {member.mention} has {role.mention} until <t:{int(until.timestamp())}:f>. Log ID: `{msg_id}`",
+            failed="❌ Cannot give that role.",
+            ephemeral=True,
+        )
+    await run_command_with_permission(interaction, "temprole", func, member, role, duration, reason)
+
+@bot.tree.command(name="warn", description="Warn a member")
+@app_commands.guild_only()
 @app_commands.describe(member="Member", reason="Reason")
 async def warn(interaction: discord.Interaction, member: discord.Member, reason: str):
     async def func(interaction, member, reason):
-        msg_id = await log_action_msg(member, interaction.user, "warn", reason)
-        await safe_dm(member, f"⚠️ You were warned in **{interaction.guild.name}** by {interaction.user}. Reason: {reason}\nWarn ID: `{msg_id}`")
-        await interaction.response.send_message(f"⚠️ {member.mention} warned. Warn ID: `{msg_id}`", ephemeral=True)
+        log_id = await run_mod_action(
+            interaction, member, "warn", reason,
+            dm=lambda msg_id: f"⚠️ You were warned in **{interaction.guild.name}** by {interaction.user}. Reason: {reason}\nWarn ID: `{msg_id}`",
+            done=lambda msg_id: f"⚠️ {member.mention} warned. Warn ID: `{msg_id}`",
+            ephemeral=True,
+        )
+        if log_id is not None:
+            await escalate_after_warn(interaction, member, log_id)
     await run_command_with_permission(interaction, "warn", func, member, reason)
 
-@bot.tree.command(name="warndelete", description="Delete a warning by Message ID", guild=discord.Object(id=GUILD_ID))
-@app_commands.describe(message_id="Message ID of the warning")
-async def warndelete(interaction: discord.Interaction, message_id: int):
-    async def func(interaction, message_id):
-        channel = interaction.guild.get_channel(MOD_LOG_CHANNEL_ID)
-        if not channel:
-            await interaction.response.send_message("❌ Mod log channel not found.", ephemeral=True)
+@bot.tree.command(name="warndelete", description="Delete a warning by Log ID")
+@app_commands.guild_only()
+@app_commands.describe(log_id="Log ID of the warning (the Warn ID)")
+async def warndelete(interaction: discord.Interaction, log_id: int):
+    async def func(interaction, log_id):
+        meta = db.get_mod_log(log_id)
+        if meta is None or meta["guild"] != interaction.guild.id:
+            await interaction.response.send_message(f"❌ Log ID {log_id} not found.", ephemeral=True)
             return
-        try:
-            msg = await channel.fetch_message(message_id)
-        except discord.NotFound:
-            await interaction.response.send_message(f"❌ Message ID {message_id} not found in mod log channel.", ephemeral=True)
+        if meta.get("action") != "warn":
+            await interaction.response.send_message("❌ That log is not a warn.", ephemeral=True)
             return
-        meta = _extract_modlog_from_content(msg.content)
-        if not meta or meta.get("action") != "warn":
-            await interaction.response.send_message("❌ That message is not a warn log.", ephemeral=True)
-            return
-        try:
-            await msg.delete()
-            await interaction.response.send_message(f"✅ Warning message {message_id} deleted.", ephemeral=True)
-        except Exception as e:
-            await interaction.response.send_message(f"❌ Failed to delete message: {e}", ephemeral=True)
-    await run_command_with_permission(interaction, "warndelete", func, message_id)
-
-@bot.tree.command(name="warnlog", description="Show warnings for a user", guild=discord.Object(id=GUILD_ID))
+        # still-queued warns have no message yet; dropping the row stops the outbox from posting it
+        if meta.get("msg_id"):
+            channel = _mod_log_channel(interaction.guild.id)
+            if not channel:
+                await interaction.response.send_message("❌ Mod log channel not found.", ephemeral=True)
+                return
+            try:
+                await channel.get_partial_message(meta["msg_id"]).delete()
+            except discord.NotFound:
+                pass
+            except Exception as e:
+                await interaction.response.send_message(f"❌ Failed to delete message: {e}", ephemeral=True)
+                return
+        db.delete_mod_log_by_id(log_id)
+        warn_windows.remove(interaction.guild.id, meta["user"], meta["timestamp"])
+        await interaction.response.send_message(f"✅ Warning {log_id} deleted.", ephemeral=True)
+    await run_command_with_permission(interaction, "warndelete", func, log_id)
+
+@bot.tree.command(name="warnlog", description="Show warnings for a user")
+@app_commands.guild_only()
 @app_commands.describe(member="Member")
 async def warnlog(interaction: discord.Interaction, member: discord.Member):
     async def func(interaction, member):
-        logs = await fetch_mod_logs(member, only_warns=True)
-        if not logs:
+        cursor = ModLogCursor(interaction.guild.id, member.id, only_warns=True)
+        if not cursor.count():
             await interaction.response.send_message(f"ℹ️ {member.mention} has no warnings.", ephemeral=True)
             return
-        view = LogView(logs, member, interaction)
+        view = LogView(cursor, member, interaction)
         await view.send_initial()
     await run_command_with_permission(interaction, "warnlog", func, member)
 
-@bot.tree.command(name="log", description="Show moderation logs for a user (excluding warns)", guild=discord.Object(id=GUILD_ID))
+@bot.tree.command(name="log", description="Show moderation logs for a user (excluding warns)")
+@app_commands.guild_only()
 @app_commands.describe(member="Member")
 async def log(interaction: discord.Interaction, member: discord.Member):
     async def func(interaction, member):
-        logs = await fetch_mod_logs(member, only_warns=False)
-        if not logs:
+        cursor = ModLogCursor(interaction.guild.id, member.id, only_warns=False)
+        if not cursor.count():
             await interaction.response.send_message(f"ℹ️ No logs found for {member.mention}.", ephemeral=True)
             return
-        view = LogView(logs, member, interaction)
+        view = LogView(cursor, member, interaction)
         await view.send_initial()
     await run_command_with_permission(interaction, "log", func, member)
 
+# ----------------------------
+# Bulk moderation (raids)
+# ----------------------------
+# Concurrent requests allowed per REST route. discord.py still honours the real bucket headers;
+# this keeps a bulk job from queueing hundreds of requests into one bucket at once, and is
+# shared by every running job so two mods bulk-banning don't double the pressure.
+ROUTE_CONCURRENCY = {"ban": 2, "timeout": 4}
+BULK_PROGRESS_INTERVAL = 2.0  # seconds between status message edits
+BULK_MAX_TARGETS = 500
+
+_route_semaphores = {}
+
+def _route_semaphore(route: str) -> asyncio.Semaphore:
+    sem = _route_semaphores.get(route)
+    if sem is None:
+        sem = _route_semaphores[route] = asyncio.Semaphore(ROUTE_CONCURRENCY.get(route, 2))
+    return sem
+
+class BulkJobQueue:
+    """
+    Runs one callable per target through the route's bounded-concurrency semaphore and reports
+    progress by editing a single status message (throttled to BULK_PROGRESS_INTERVAL).
+    """
+    def __init__(self, route: str, status_message, label: str):
+        self.route = route
+        self.status_message = status_message
+        self.label = label
+        self.done = 0
+        self.failed = {}
+        self.succeeded = []
+        self.total = 0
+        self._last_edit = 0.0
+
+    def status_text(self, finished: bool = False) -> str:
+        head = "✅ Finished" if finished else "⏳ Running"
+        text = f"{head} {self.label}: {self.done}/{self.total} processed, {len(self.succeeded)} ok, {len(self.failed)} failed."
+        if finished and self.failed:
+            text += "\n" + "\n".join(f"• `{tid}`: {err}" for tid, err in list(self.failed.items())[:15])
+        return text
+
+    async def _report(self, force: bool = False):
+        now = asyncio.get_running_loop().time()
+        if not force and now - self._last_edit < BULK_PROGRESS_INTERVAL:
+            return
+        self._last_edit = now
+        try:
+            await self.status_message.edit(content=self.status_text(finished=force))
+        except Exception as e:
+            print("⚠️ Failed to update bulk status message:", e)
+
+    async def _run_one(self, target_id: int, job):
+        async with _route_semaphore(self.route):
+            try:
+                await job()
+                self.succeeded.append(target_id)
+            except discord.HTTPException as e:
+                self.failed[target_id] = e.text or type(e).__name__
+            except Exception as e:
+                self.failed[target_id] = str(e)
+        self.done += 1
+        await self._report()
+
+    async def run(self, jobs: dict) -> list:
+        """`jobs` maps target id -> zero-arg coroutine function. Returns the ids that succeeded."""
+        self.total = len(jobs) + len(self.failed)  # targets rejected up front count as processed
+        self.done = len(self.failed)
+        await asyncio.gather(*(self._run_one(tid, job) for tid, job in jobs.items()))
+        await self._report(force=True)
+        return self.succeeded
+
+def parse_bulk_targets(guild: discord.Guild, ids_text: str, joined_within: int = None) -> list:
+    """
+    User IDs / mentions in `ids_text` plus members who joined in the last `joined_within` minutes:
+    from the member cache, or in lazy member mode from the joins seen since the bot started.
+    """
+    targets = [int(x) for x in re.findall(r"\d{15,20}", ids_text or "")]
+    if joined_within:
+        cutoff = discord.utils.utcnow() - timedelta(minutes=joined_within)
+        if LAZY_MEMBERS:
+            targets += recent_joins.since(guild.id, cutoff)
+        else:
+            targets += [m.id for m in guild.members if m.joined_at and m.joined_at >= cutoff and not m.bot]
+    return list(dict.fromkeys(targets))  # de-duplicate, keep order
+
+async def run_bulk_action(interaction: discord.Interaction, action: str, route: str, targets: list, make_job, reason: str,
+                          duration: int = None, prepare=None):
+    """`prepare(targets)`, if given, is awaited after the interaction is deferred and before make_job runs."""
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    targets = [t for t in targets if t not in (interaction.user.id, bot.user.id)]
+    if not targets:
+        await interaction.followup.send("❌ No targets found.", ephemeral=True)
+        return
+    if len(targets) > BULK_MAX_TARGETS:
+        await interaction.followup.send(f"❌ Too many targets ({len(targets)}); the limit is {BULK_MAX_TARGETS}.", ephemeral=True)
+        return
+    if prepare is not None:
+        await prepare(targets)
+    status = await interaction.followup.send(f"⏳ Starting bulk {action} of {len(targets)} user(s)...", ephemeral=True, wait=True)
+    queue = BulkJobQueue(route, status, f"bulk {action}")
+    jobs = {}
+    for tid in targets:
+        job = make_job(tid)
+        if job is None:
+            queue.failed[tid] = "not a member"
+        else:
+            jobs[tid] = job
+    succeeded = await queue.run(jobs)
+    if succeeded:
+        await log_actions_batch(interaction.guild, interaction.user, action, reason, succeeded, duration)
+
+@bot.tree.command(name="bulkban", description="Ban many users at once (IDs/mentions and/or recent joiners)")
+@app_commands.guild_only()
+@app_commands.describe(users="User IDs or mentions, separated by spaces or commas", joined_within="Also ban members who joined in the last N minutes", reason="Reason")
+async def bulkban(interaction: discord.Interaction, users: str = "", joined_within: app_commands.Range[int, 1, MAX_DURATION_MINUTES] = None, reason: str = "No reason provided"):
+    async def func(interaction, users, joined_within, reason):
+        guild = interaction.guild
+        targets = parse_bulk_targets(guild, users, joined_within)
+        # banning by Object works for members and for IDs that already left
+        make_job = lambda tid: (lambda: guild.ban(discord.Object(id=tid), reason=reason, delete_message_seconds=0))
+        await run_bulk_action(interaction, "ban", "ban", targets, make_job, reason)
+    await run_command_with_permission(interaction, "bulkban", func, users, joined_within, reason)
+
+@bot.tree.command(name="bulktimeout", description="Timeout many members at once (IDs/mentions and/or recent joiners)")
+@app_commands.guild_only()
+@app_commands.describe(duration="In minutes", users="User IDs or mentions, separated by spaces or commas", joined_within="Also timeout members who joined in the last N minutes", reason="Reason")
+async def bulktimeout(interaction: discord.Interaction, duration: app_commands.Range[int, 1, MAX_DURATION_MINUTES], users: str = "", joined_within: app_commands.Range[int, 1, MAX_DURATION_MINUTES] = None, reason: str = "No reason provided"):
+    async def func(interaction, duration, users, joined_within, reason):
+        guild = interaction.guild
+        targets = parse_bulk_targets(guild, users, joined_within)
+        until = discord.utils.utcnow() + timedelta(minutes=duration)
+        members = {}
+
+        async def prepare(targets):
+            # one query_members round-trip per 100 uncached ids instead of a fetch per target
+            members.update(await member_cache.fetch_members(guild, targets, member_lru))
+
+        def make_job(tid):
+            member = members.get(tid)
+            return None if member is None else (lambda: apply_timeout(member, until, reason))
+
+        await run_bulk_action(interaction, "timeout", "timeout", targets, make_job, reason, duration, prepare=prepare)
+    await run_command_with_permission(interaction, "bulktimeout", func, duration, users, joined_within, reason)
+
+# ----------------------------
+# Guild setup (administrators; works before the guild has any config)
+# ----------------------------
+async def _require_admin(interaction: discord.Interaction) -> bool:
+    if isinstance(interaction.user, discord.Member) and interaction.user.guild_permissions.administrator:
+        return True
+    await interaction.response.send_message("❌ Only server administrators can change the bot's setup.", ephemeral=True)
+    return False
+
+@bot.tree.command(name="setup", description="Configure the bot's channels for this server")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(mod_log_channel="Channel where moderation logs are posted", blacklist_channel="Channel showing the blacklist")
+async def setup_guild(interaction: discord.Interaction, mod_log_channel: discord.TextChannel, blacklist_channel: discord.TextChannel = None):
+    if not await _require_admin(interaction):
+        return
+    guild_id = interaction.guild.id
+    config = guild_config.get(guild_id) or GuildConfig(guild_id)
+    changes = {"mod_log_channel_id": mod_log_channel.id}
+    if blacklist_channel is not None and blacklist_channel.id != config.blacklist_channel_id:
+        # a different channel can't edit the old channel's messages
+        changes.update(blacklist_channel_id=blacklist_channel.id, blacklist_message_id=None)
+        db.delete_blacklist_shards(guild_id)
+        get_blacklist(guild_id).shards = None
+    guild_config.save(config.replace(**changes))
+    if mod_log_channel.id != config.mod_log_channel_id:
+        _modlog_synced.discard(guild_id)
+        asyncio.create_task(sync_mod_log_channel(interaction.guild))
+    text = f"✅ Mod logs go to {mod_log_channel.mention}"
+    blacklist_id = changes.get("blacklist_channel_id", config.blacklist_channel_id)
+    if blacklist_id:
+        text += f", blacklist shown in <#{blacklist_id}>"
+    await interaction.response.send_message(text + ". Grant commands to roles with `/tier`.", ephemeral=True)
+
+@bot.tree.command(name="tier", description="Set which bot commands a role may use")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(role="Role", allowed="Comma-separated command names, or 'none' to remove the role")
+async def tier(interaction: discord.Interaction, role: discord.Role, allowed: str):
+    if not await _require_admin(interaction):
+        return
+    config = guild_config.get(interaction.guild.id)
+    if config is None:
+        await interaction.response.send_message("⚙️ Run `/setup` first.", ephemeral=True)
+        return
+    names = [c.strip().lstrip("/").lower() for c in allowed.split(",") if c.strip()]
+    unknown = [c for c in names if c not in guild_config.TIER_COMMANDS and c != "none"]
+    if unknown:
+        await interaction.response.send_message(
+            f"❌ Unknown command(s): {', '.join(unknown)}. Valid: {', '.join(guild_config.TIER_COMMANDS)}", ephemeral=True)
+        return
+    tiers = dict(config.permission_tiers)
+    granted = [c for c in dict.fromkeys(names) if c != "none"]
+    if granted:
+        tiers[role.id] = granted
+    else:
+        tiers.pop(role.id, None)
+    guild_config.save(config.replace(permission_tiers=tiers))
+    invalidate_member_permissions(interaction.guild.id)
+    summary = ", ".join(granted) if granted else "nothing"
+    await interaction.response.send_message(f"✅ {role.mention} can now use: {summary}.", ephemeral=True)
+
+@bot.tree.command(name="escalation", description="Add, replace or remove an automatic warn escalation rule")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+@app_commands.describe(warns="Warns needed", days="Within this many days", action="What happens ('remove' deletes the rule)",
+                       duration="Minutes, for timeout / tempban")
+async def escalation_rule(interaction: discord.Interaction, warns: app_commands.Range[int, 1, 100], days: app_commands.Range[int, 1, 365],
+                          action: Literal["timeout", "kick", "ban", "tempban", "remove"], duration: app_commands.Range[int, 1, MAX_DURATION_MINUTES] = None):
+    if not await _require_admin(interaction):
+        return
+    config = guild_config.get(interaction.guild.id)
+    if config is None:
+        await interaction.response.send_message("⚙️ Run `/setup` first.", ephemeral=True)
+        return
+    if action in ("timeout", "tempban") and duration is None:
+        await interaction.response.send_message(f"❌ A {action} rule needs a duration.", ephemeral=True)
+        return
+    window = days * escalation.DAY
+    rules = [r for r in config.escalation_rules if (r.warns, r.window) != (warns, window)]
+    if action != "remove":
+        rules.append(escalation.EscalationRule(warns, window, action, duration if action in ("timeout", "tempban") else None))
+    rules.sort(key=lambda r: (r.warns, r.window))
+    guild_config.save(config.replace(escalation_rules=rules))
+    seed_warn_windows(interaction.guild.id)  # the horizon may have grown
+    listing = "\n".join(f"• {r.describe()}" for r in rules) or "*(no rules)*"
+    await interaction.response.send_message(f"✅ Escalation rules:\n{listing}", ephemeral=True)
+
+# ----------------------------
+# Instrumentation (/stats, gateway counters)
+# ----------------------------
+@bot.listen("on_connect")
+async def metrics_on_connect():
+    metrics.inc("gateway_connect")
+
+@bot.listen("on_disconnect")
+async def metrics_on_disconnect():
+    metrics.inc("gateway_disconnect")
+
+@bot.listen("on_resumed")
+async def metrics_on_resumed():
+    metrics.inc("gateway_resume")
+
+@bot.listen("on_ready")
+async def metrics_on_ready():
+    metrics.inc("gateway_ready")
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms"
+
+@bot.tree.command(name="stats", description="Show bot latency and REST statistics")
+@app_commands.guild_only()
+async def stats(interaction: discord.Interaction):
+    async def func(interaction):
+        embed = discord.Embed(title="📊 Bot stats", color=discord.Color.dark_theme())
+        embed.add_field(name="Gateway", value=(
+            f"Latency: {_ms(bot.latency)}\n"
+            f"Connects: {metrics.counters.get('gateway_connect', 0)} · Disconnects: {metrics.counters.get('gateway_disconnect', 0)} · "
+            f"Resumes: {metrics.counters.get('gateway_resume', 0)}\n"
+            f"Loop lag p99: {_ms(metrics.loop_lag.quantile(0.99))} · max: {_ms(metrics.loop_lag.max)}"
+        ), inline=False)
+        if LAZY_MEMBERS:
+            embed.add_field(name="Member cache (lazy)", value=(
+                f"{len(member_lru)}/{member_lru.capacity} cached · {member_lru.hits} hits · {member_lru.misses} misses"
+            ), inline=False)
+
+        by_command = {}
+        for (command, phase), hist in metrics.command_phases.items():
+            by_command.setdefault(command, {})[phase] = hist
+        lines = []
+        for command, phases in sorted(by_command.items(), key=lambda kv: -kv[1].get("total", metrics.Histogram()).count)[:10]:
+            total = phases.get("total")
+            parts = [f"{phase} {_ms(h.quantile(0.5))}/{_ms(h.quantile(0.99))}" for phase, h in sorted(phases.items()) if phase != "total"]
+            head = f"**/{command}** ×{total.count} p50/p99 {_ms(total.quantile(0.5))}/{_ms(total.quantile(0.99))}" if total else f"**/{command}**"
+            lines.append(head + (f"\n  {' · '.join(parts)}" if parts else ""))
+        embed.add_field(name="Commands (p50/p99)", value="\n".join(lines)[:1024] or "No commands yet.", inline=False)
+
+        routes = sorted(metrics.rest_calls.items(), key=lambda kv: -kv[1])[:10]
+        rest_lines = [f"`{route}` {n} calls, {metrics.rest_429s.get(route, 0)} × 429, p99 {_ms(metrics.rest_latency[route].quantile(0.99))}" for route, n in routes]
+        embed.add_field(name="REST (top routes)", value="\n".join(rest_lines)[:1024] or "No REST calls yet.", inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+    await run_owner_command(interaction, "stats", func)
+
+@bot.tree.command(name="resync", description="Force a slash command sync")
+@app_commands.guild_only()
+async def resync(interaction: discord.Interaction):
+    async def func(interaction):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            await bot.sync_commands(force=True)
+        except discord.HTTPException as e:
+            await interaction.followup.send(f"❌ Sync failed: {e}", ephemeral=True)
+            return
+        await interaction.followup.send("✅ Slash commands resynced.", ephemeral=True)
+    await run_owner_command(interaction, "resync", func)
+
+@bot.tree.command(name="modstats", description="Top offenders or most active moderators over a time range")
+@app_commands.guild_only()
+@app_commands.describe(by="Rank members who were actioned, or the moderators who acted", days="How many days back to count",
+                       action="Only count this action")
+async def modstats(interaction: discord.Interaction, by: Literal["users", "moderators"] = "users",
+                   days: app_commands.Range[int, 1, 3650] = 30, action: STATS_ACTIONS = None):
+    async def func(interaction):
+        last_day = int(time.time()) // escalation.DAY
+        first_day = last_day - days + 1
+        kind = "user" if by == "users" else "moderator"
+        cursor = ModStatsCursor(interaction.guild.id, kind, first_day, last_day, action)
+        title = f"{'Top offenders' if kind == 'user' else 'Moderator activity'}: last {days} day(s)"
+        if action:
+            title += f", {action} only"
+        view = ModStatsView(cursor, interaction, title, db.mod_stats_totals(interaction.guild.id, first_day, last_day))
+        await view.send_initial()
+    await run_command_with_permission(interaction, "modstats", func)
+
+@bot.tree.command(name="export", description="Export moderation history as a compressed file")
+@app_commands.guild_only()
+@app_commands.describe(
+    source="index: the local database (fast) · channel: re-read the mod log channel",
+    fmt="File format",
+    resume="Only entries after the previous export, and move the export cursor forward",
+)
+async def export_history(interaction: discord.Interaction, source: Literal["index", "channel"] = "index",
+                         fmt: Literal["jsonl", "csv"] = "jsonl", resume: bool = True):
+    async def func(interaction):
+        guild = interaction.guild
+        channel = None
+        if source == "channel":
+            channel = _mod_log_channel(guild.id)
+            if channel is None:
+                await interaction.response.send_message("❌ Mod log channel not found.", ephemeral=True)
+                return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        key = export.cursor_key(guild.id)
+        after = int(db.get_state(key, 0)) if resume else 0
+        # spooled to disk as it is written; only the gzip window is ever in memory
+        with tempfile.TemporaryFile() as f:
+            writer = export.ExportWriter(f, fmt)
+            if channel is not None:
+                await export.export_channel(channel, writer, after)
+            else:
+                def run():
+                    conn = db.open_reader()
+                    try:
+                        export.export_index(guild.id, writer, after, conn=conn)
+                    finally:
+                        conn.close()
+                await asyncio.to_thread(run)
+            writer.close()
+            if writer.count == 0:
+                await interaction.followup.send("Nothing new to export." if after else "No moderation history to export.", ephemeral=True)
+                return
+            size = f.tell()
+            if size > guild.filesize_limit:
+                await interaction.followup.send(
+                    f"❌ The export is {size / 1e6:.1f} MB, over this server's upload limit. "
+                    f"Run `python export.py {guild.id} <file> --resume` on the bot host instead.", ephemeral=True)
+                return
+            f.seek(0)
+            name = f"modlogs-{guild.id}-{writer.last_msg_id}.{fmt}.gz"
+            await interaction.followup.send(
+                f"✅ Exported {writer.count} entries" + (f" after message {after}." if after else "."),
+                file=discord.File(f, filename=name), ephemeral=True)
+        if resume:
+            db.set_state(key, writer.last_msg_id)
+    await run_command_with_permission(interaction, "export", func)
+
 # ----------------------------
 # ----------------------------
 #  CONTROL PANEL (Owner-only)
 # ----------------------------
 # ----------------------------
+# Channels a member can see, computed once per (member, role set) and reused until a channel or
+# role changes, so opening the panel or typing in its autocomplete never re-walks every channel.
+PANEL_PAGE_SIZE = 25              # Discord's cap on select options
+CHANNEL_INDEX_PER_GUILD = 256     # cached member views per guild before the guild's cache is reset
+
+_channel_index = {}  # guild id -> {(member id, role ids): tuple of (channel id, name)}
+
+def visible_text_channels(member: discord.Member) -> tuple:
+    guild_index = _channel_index.setdefault(member.guild.id, {})
+    key = (member.id, frozenset(r.id for r in member.roles))
+    channels = guild_index.get(key)
+    if channels is None:
+        if len(guild_index) >= CHANNEL_INDEX_PER_GUILD:
+            guild_index.clear()
+        channels = guild_index[key] = tuple(
+            (ch.id, ch.name) for ch in member.guild.text_channels if ch.permissions_for(member).view_channel
+        )
+    return channels
+
+def invalidate_channel_index(guild_id: int):
+    _channel_index.pop(guild_id, None)
+
+@bot.listen("on_guild_channel_create")
+async def channel_index_on_channel_create(channel):
+    invalidate_channel_index(channel.guild.id)
+
+@bot.listen("on_guild_channel_delete")
+async def channel_index_on_channel_delete(channel):
+    invalidate_channel_index(channel.guild.id)
+
+@bot.listen("on_guild_channel_update")
+async def channel_index_on_channel_update(before, after):
+    # renames, moves and permission overwrite changes
+    invalidate_channel_index(after.guild.id)
+
+@bot.listen("on_guild_role_update")
+async def channel_index_on_role_update(before: discord.Role, after: discord.Role):
+    if before.permissions != after.permissions or before.position != after.position:
+        invalidate_channel_index(after.guild.id)
+
+@bot.listen("on_guild_role_delete")
+async def channel_index_on_role_delete(role: discord.Role):
+    invalidate_channel_index(role.guild.id)
+
+@bot.listen("on_guild_remove")
+async def channel_index_on_guild_remove(guild: discord.Guild):
+    invalidate_channel_index(guild.id)
+
 class ChannelSelect(Select):
-    def __init__(self):
-        super().__init__(placeholder="Select a text channel...", min_values=1, max_values=1, options=[])
+    def __init__(self, channels=()):
+        super().__init__(placeholder="Select a text channel...", min_values=1, max_values=1,
+                         options=[discord.SelectOption(label=f"#{name}"[:100], value=str(channel_id)) for channel_id, name in channels])
 
     async def callback(self, interaction: discord.Interaction):
         # value is channel id as str
-        channel_id = int(self.values[0])
-        channel = interaction.guild.get_channel(channel_id)
-        if channel is None:
-            await interaction.response.send_message("❌ Invalid channel selected.", ephemeral=True)
-            return
+        await open_channel_actions(interaction, int(self.values[0]))
 
-        view = ChannelActions(channel, interaction.user.id)
-        await interaction.response.send_message(f"🛠 Control panel for <#{channel_id}>", view=view, ephemeral=True)
+async def open_channel_actions(interaction: discord.Interaction, channel_id: int):
+    channel = interaction.guild.get_channel(channel_id)
+    if channel is None or not channel.permissions_for(interaction.user).view_channel:
+        await interaction.response.send_message("❌ Invalid channel selected.", ephemeral=True)
+        return
+
+    view = ChannelActions(channel, interaction.user.id)
+    await interaction.response.send_message(f"🛠 Control panel for <#{channel_id}>", view=view, ephemeral=True)
 
 class ControlPanelView(View):
-    def __init__(self, user_id):
+    """The member's visible channels, PANEL_PAGE_SIZE per select, with buttons to page through them."""
+    def __init__(self, user_id, channels: tuple, page: int = 0):
         super().__init__(timeout=300)
         self.user_id = user_id
-        self.add_item(ChannelSelect())
+        self.channels = channels
+        self.pages = max(1, -(-len(channels) // PANEL_PAGE_SIZE))
+        self.page = 0
+        self.prev_button = Button(label="◀️ Prev", style=discord.ButtonStyle.gray, row=1)
+        self.next_button = Button(label="▶️ Next", style=discord.ButtonStyle.gray, row=1)
+        self.prev_button.callback = self.prev_page
+        self.next_button.callback = self.next_page
+        self.show_page(page)
+
+    def show_page(self, page: int):
+        self.page = max(0, min(self.pages - 1, page))
+        self.clear_items()
+        start = self.page * PANEL_PAGE_SIZE
+        self.add_item(ChannelSelect(self.channels[start:start + PANEL_PAGE_SIZE]))
+        if self.pages > 1:
+            self.prev_button.disabled = self.page == 0
+            self.next_button.disabled = self.page == self.pages - 1
+            self.add_item(self.prev_button)
+            self.add_item(self.next_button)
+
+    def content(self) -> str:
+        text = "🛠 Bot Control Panel — choose a channel"
+        if self.pages > 1:
+            text += f" (page {self.page + 1}/{self.pages}, {len(self.channels)} channels; or use `/panel channel:` to search)"
+        return text
+
+    async def prev_page(self, interaction: discord.Interaction):
+        self.show_page(self.page - 1)
+        await interaction.response.edit_message(content=self.content(), view=self)
+
+    async def next_page(self, interaction: discord.Interaction):
+        self.show_page(self.page + 1)
+        await interaction.response.edit_message(content=self.content(), view=self)
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         return interaction.user.id == self.user_id
@@ -566,6 +2041,40 @@ class EmbedModal(Modal, title="Create Embed"):
         except Exception as e:
             await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
 
+# ----------------------------
+# Attachment relay (stream a URL into a spooled temp file, capped at the upload limit)
+# ----------------------------
+RELAY_CHUNK = 64 * 1024
+RELAY_SPOOL_MEMORY = 1024 * 1024   # bytes kept in memory before the spool rolls over to disk
+RELAY_CONCURRENCY = 3              # downloads at once; a queue of big relays can't balloon the process
+
+_relay_semaphore = asyncio.Semaphore(RELAY_CONCURRENCY)
+
+class RelayError(Exception):
+    """A relay download was refused (bad status, too large); the message is shown to the user."""
+
+async def download_to_spool(session: aiohttp.ClientSession, url: str, max_bytes: int):
+    """Stream `url` into a SpooledTemporaryFile, aborting as soon as it exceeds `max_bytes`."""
+    async with session.get(url) as resp:
+        if resp.status != 200:
+            raise RelayError(f"Failed to download file: HTTP {resp.status}")
+        # reject before reading a byte when the server announces the size
+        if resp.content_length is not None and resp.content_length > max_bytes:
+            raise RelayError(f"File is {resp.content_length / 1e6:.1f} MB; this server's upload limit is {max_bytes / 1e6:.1f} MB.")
+        spool = tempfile.SpooledTemporaryFile(max_size=RELAY_SPOOL_MEMORY)
+        size = 0
+        try:
+            async for chunk in resp.content.iter_chunked(RELAY_CHUNK):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise RelayError(f"File exceeds this server's upload limit of {max_bytes / 1e6:.1f} MB.")
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+    spool.seek(0)
+    return spool
+
 class AttachmentModal(Modal, title="Send Attachment (via file URL)"):
     file_url = TextInput(label="File URL (http/https)", required=True)
     filename = TextInput(label="Filename to save as (optional)", required=False, placeholder="example.png")
@@ -582,21 +2091,17 @@ class AttachmentModal(Modal, title="Send Attachment (via file URL)"):
             return
         await interaction.response.defer(ephemeral=True)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        await interaction.followup.send(f"❌ Failed to download file: HTTP {resp.status}", ephemeral=True)
-                        return
-                    data = await resp.read()
-            fp = io.BytesIO(data)
-            # choose filename
-            if not fname:
-                # try to infer from URL
-                fname = url.split("/")[-1].split("?")[0] or "file"
-            fp.seek(0)
-            discord_file = discord.File(fp, filename=fname)
-            await self.channel.send(file=discord_file)
+            async with _relay_semaphore:
+                spool = await download_to_spool(bot.http_session, url, self.channel.guild.filesize_limit)
+                with spool:
+                    # choose filename
+                    if not fname:
+                        # try to infer from URL
+                        fname = url.split("/")[-1].split("?")[0] or "file"
+                    await self.channel.send(file=discord.File(spool, filename=fname))
             await interaction.followup.send("✅ Attachment sent!", ephemeral=True)
+        except RelayError as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
         except discord.Forbidden:
             await interaction.followup.send("❌ Bot lacks permission to send attachments in that channel.", ephemeral=True)
         except Exception as e:
@@ -637,33 +2142,46 @@ class ChannelActions(View):
 
 
 # ----------------------------
-# /panel command (unchanged)
+# /panel command
 # ----------------------------
-@bot.tree.command(name="panel", description="Open the bot control panel", guild=discord.Object(id=GUILD_ID))
-async def panel(interaction: discord.Interaction):
-    text_channels = [ch for ch in interaction.guild.text_channels if ch.permissions_for(interaction.user).view_channel]
-    if not text_channels:
-        await interaction.response.send_message("❌ No accessible text channels found.", ephemeral=True)
-        return
-
-    view = View(timeout=300)
-
-    # create select with options
-    select = ChannelSelect()
-    for ch in text_channels[:25]:  # Discord limit
-        select.options.append(discord.SelectOption(label=f"#{ch.name}", value=str(ch.id)))
-    view.add_item(select)
-
-    await interaction.response.send_message(
-        "🛠 Bot Control Panel — choose a channel",
-        view=view,
-        ephemeral=True
-    )
+async def panel_channel_autocomplete(interaction: discord.Interaction, current: str):
+    # suggestions list channel names, so they're only offered to members allowed to open the panel
+    if interaction.guild is None or guild_config.get(interaction.guild.id) is None or not await check_permissions(interaction, "panel"):
+        return []
+    needle = current.lower().lstrip("#")
+    choices = []
+    for channel_id, name in visible_text_channels(interaction.user):
+        if needle in name.lower():
+            choices.append(app_commands.Choice(name=f"#{name}"[:100], value=str(channel_id)))
+            if len(choices) == 25:
+                break
+    return choices
+
+@bot.tree.command(name="panel", description="Open the bot control panel")
+@app_commands.guild_only()
+@app_commands.describe(channel="Jump straight to a channel (type to search)")
+@app_commands.autocomplete(channel=panel_channel_autocomplete)
+async def panel(interaction: discord.Interaction, channel: str = None):
+    async def func(interaction, channel):
+        if channel is not None:
+            if not channel.isdigit():
+                await interaction.response.send_message("❌ Pick a channel from the suggestions.", ephemeral=True)
+                return
+            await open_channel_actions(interaction, int(channel))
+            return
 
+        text_channels = visible_text_channels(interaction.user)
+        if not text_channels:
+            await interaction.response.send_message("❌ No accessible text channels found.", ephemeral=True)
+            return
 
+        view = ControlPanelView(interaction.user.id, text_channels)
+        await interaction.response.send_message(view.content(), view=view, ephemeral=True)
+    await run_command_with_permission(interaction, "panel", func, channel)
 
 # ----------------------------
 # Run the bot
 # ----------------------------
-webserver.keep_alive()
-bot.run(token)
+# guarded so benchmarks can import the handlers without connecting
+if __name__ == "__main__":
+    bot.run(token)
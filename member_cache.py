@@ -0,0 +1,84 @@
+import collections
+
+import discord
+
+# ----------------------------
+# Lazy member cache
+# ----------------------------
+# With discord.py's member cache disabled, members seen in interactions and join events are
+# kept in a bounded LRU instead; anything else is resolved on demand with query_members over the
+# gateway, up to 100 ids per request, rather than chunking whole guilds at startup.
+
+QUERY_BATCH = 100  # Discord's cap on user_ids per Request Guild Members
+
+class MemberLRU:
+    """Bounded (guild id, user id) -> Member map; the least recently used entry is evicted first."""
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._members = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._members)
+
+    def get(self, guild_id: int, user_id: int):
+        key = (guild_id, user_id)
+        member = self._members.get(key)
+        if member is None:
+            self.misses += 1
+            return None
+        self._members.move_to_end(key)
+        self.hits += 1
+        return member
+
+    def put(self, member: discord.Member):
+        key = (member.guild.id, member.id)
+        self._members[key] = member
+        self._members.move_to_end(key)
+        if len(self._members) > self.capacity:
+            self._members.popitem(last=False)
+
+    def discard(self, guild_id: int, user_id: int = None):
+        if user_id is not None:
+            self._members.pop((guild_id, user_id), None)
+            return
+        for key in [k for k in self._members if k[0] == guild_id]:
+            del self._members[key]
+
+class RecentJoins:
+    """Per-guild ring of (joined_at, user id), so "joined in the last N minutes" works without a member list."""
+    def __init__(self, per_guild: int):
+        self.per_guild = per_guild
+        self._joins = {}
+
+    def add(self, member: discord.Member):
+        ring = self._joins.get(member.guild.id)
+        if ring is None:
+            ring = self._joins[member.guild.id] = collections.deque(maxlen=self.per_guild)
+        ring.append((member.joined_at or discord.utils.utcnow(), member.id))
+
+    def since(self, guild_id: int, cutoff) -> list:
+        return [uid for joined_at, uid in self._joins.get(guild_id, ()) if joined_at >= cutoff]
+
+    def discard(self, guild_id: int):
+        self._joins.pop(guild_id, None)
+
+async def fetch_members(guild: discord.Guild, user_ids, lru: MemberLRU) -> dict:
+    """
+    user id -> Member for every id that is a member of `guild`. Served from discord.py's cache
+    and the LRU first; the rest costs one query_members round-trip per 100 ids.
+    """
+    found, missing = {}, []
+    for uid in dict.fromkeys(user_ids):
+        member = guild.get_member(uid) or lru.get(guild.id, uid)
+        if member is None:
+            missing.append(uid)
+        else:
+            found[uid] = member
+    for i in range(0, len(missing), QUERY_BATCH):
+        chunk = missing[i:i + QUERY_BATCH]
+        for member in await guild.query_members(user_ids=chunk, limit=len(chunk), cache=False):
+            lru.put(member)
+            found[member.id] = member
+    return found
@@ -0,0 +1,157 @@
+import asyncio
+import contextvars
+import re
+import time
+from contextlib import contextmanager
+
+import aiohttp
+
+# ----------------------------
+# In-process instrumentation
+# ----------------------------
+# Everything is plain dicts updated on the event loop; /metrics and /stats read them directly.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOOP_LAG_INTERVAL = 0.5  # seconds between event-loop lag samples
+
+# the slash command currently running; set once per invocation, inherited by gathered tasks
+current_command = contextvars.ContextVar("current_command", default=None)
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, edge in enumerate(BUCKETS):
+            if value <= edge:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-quantile (what Prometheus would estimate)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+command_phases = {}   # (command, phase) -> Histogram
+loop_lag = Histogram()
+rest_calls = {}       # route -> requests sent (including retries)
+rest_429s = {}        # route -> 429 responses
+rest_latency = {}     # route -> Histogram
+counters = {}         # name -> int (gateway events, command errors, ...)
+
+def inc(name: str, amount: int = 1):
+    counters[name] = counters.get(name, 0) + amount
+
+def observe(phase: str, seconds: float, command: str = None):
+    key = (command or current_command.get() or "unknown", phase)
+    hist = command_phases.get(key)
+    if hist is None:
+        hist = command_phases[key] = Histogram()
+    hist.observe(seconds)
+
+@contextmanager
+def timed(phase: str, command: str = None):
+    """`with metrics.timed("dm"):` records the block under the current command."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(phase, time.perf_counter() - start, command)
+
+# ----------------------------
+# REST instrumentation (aiohttp trace hooks on discord.py's session)
+# ----------------------------
+_SNOWFLAKE = re.compile(r"/\d{15,21}")
+_TOKEN = re.compile(r"/[A-Za-z0-9_\-.]{60,}")
+
+def route_key(method: str, path: str) -> str:
+    path = path.split("/api/v", 1)[-1]
+    path = path.split("/", 1)[1] if "/" in path else path
+    return f"{method} /" + _TOKEN.sub("/{token}", _SNOWFLAKE.sub("/{id}", "/" + path)).lstrip("/")
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_start(session, ctx, params):
+        ctx.start = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        route = route_key(params.method, params.url.path)
+        rest_calls[route] = rest_calls.get(route, 0) + 1
+        if params.response.status == 429:
+            rest_429s[route] = rest_429s.get(route, 0) + 1
+        hist = rest_latency.get(route)
+        if hist is None:
+            hist = rest_latency[route] = Histogram()
+        hist.observe(time.perf_counter() - ctx.start)
+
+    async def on_request_exception(session, ctx, params):
+        inc("rest_errors")
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
+
+# ----------------------------
+# Event-loop lag sampler
+# ----------------------------
+async def sample_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag.observe(max(0.0, loop.time() - start - LOOP_LAG_INTERVAL))
+
+# ----------------------------
+# Exposition
+# ----------------------------
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def _histogram_lines(name: str, labels: str, hist: Histogram) -> list:
+    lines, cumulative = [], 0
+    sep = "," if labels else ""
+    for edge, c in zip(BUCKETS, hist.counts):
+        cumulative += c
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{edge}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+    lines.append(f"{name}_sum{{{labels}}} {hist.total:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+def prometheus_lines() -> list:
+    lines = [
+        "# HELP modbot_command_phase_seconds Command latency by phase (permission, action, log, dm, response, total).",
+        "# TYPE modbot_command_phase_seconds histogram",
+    ]
+    for (command, phase), hist in sorted(command_phases.items()):
+        lines += _histogram_lines("modbot_command_phase_seconds", f'command="{_label(command)}",phase="{phase}"', hist)
+    lines += ["# HELP modbot_rest_requests_total REST requests sent, by route.", "# TYPE modbot_rest_requests_total counter"]
+    lines += [f'modbot_rest_requests_total{{route="{_label(r)}"}} {n}' for r, n in sorted(rest_calls.items())]
+    lines += ["# HELP modbot_rest_429_total REST 429 responses, by route.", "# TYPE modbot_rest_429_total counter"]
+    lines += [f'modbot_rest_429_total{{route="{_label(r)}"}} {n}' for r, n in sorted(rest_429s.items())]
+    lines += ["# HELP modbot_rest_seconds REST request latency, by route.", "# TYPE modbot_rest_seconds histogram"]
+    for route, hist in sorted(rest_latency.items()):
+        lines += _histogram_lines("modbot_rest_seconds", f'route="{_label(route)}"', hist)
+    lines += ["# HELP modbot_event_loop_lag_seconds Extra delay observed by a periodic sleep.", "# TYPE modbot_event_loop_lag_seconds histogram"]
+    lines += _histogram_lines("modbot_event_loop_lag_seconds", "", loop_lag)
+    lines += ["# HELP modbot_events_total Gateway and bot events.", "# TYPE modbot_events_total counter"]
+    lines += [f'modbot_events_total{{event="{_label(k)}"}} {v}' for k, v in sorted(counters.items())]
+    return lines
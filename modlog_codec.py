@@ -0,0 +1,91 @@
+import json
+
+# ----------------------------
+# Modlog metadata codec
+# ----------------------------
+# Metadata rides in an invisible spoiler in the log message content. The prefix is the version tag:
+#   v1  ||__modlog__:{"user":...,"moderator":...}||      (plain JSON, the original format)
+#   v2  ||__ml2__:{"u":...,"m":...}||                     (compact: short keys)
+# Either may carry a JSON list instead of an object for batch logs.
+
+MODLOG_PREFIX = "__modlog__:"          # v1 marker prefix
+MODLOG_PREFIX_V2 = "__ml2__:"          # v2 (compact) marker prefix
+SPoILER_WRAP = ("||", "||")            # invisible spoiler wrappers
+
+COMPACT_KEYS = {
+    "user": "u",
+    "moderator": "m",
+    "action": "a",
+    "reason": "r",
+    "timestamp": "t",
+    "duration": "d",
+    "log_id": "i",
+    "msg_id": "x",
+}
+EXPANDED_KEYS = {short: key for key, short in COMPACT_KEYS.items()}
+
+_FAST_PREFIXES = (SPoILER_WRAP[0] + MODLOG_PREFIX, SPoILER_WRAP[0] + MODLOG_PREFIX_V2)
+_decoder = json.JSONDecoder()
+
+def wrap_spoiler(s: str) -> str:
+    return f"{SPoILER_WRAP[0]}{s}{SPoILER_WRAP[1]}"
+
+def _compact(entry: dict) -> dict:
+    # None values are dropped entirely; decode restores them as missing keys
+    return {COMPACT_KEYS.get(k, k): v for k, v in entry.items() if v is not None}
+
+def encode(data, compact: bool = False) -> str:
+    """Encode one entry (dict) or a batch (list of dicts) as hidden message content."""
+    if compact:
+        body = [_compact(e) for e in data] if isinstance(data, list) else _compact(data)
+        prefix = MODLOG_PREFIX_V2
+    else:
+        body, prefix = data, MODLOG_PREFIX
+    return wrap_spoiler(prefix + json.dumps(body, separators=(",", ":"), ensure_ascii=False))
+
+def _find_payload(content: str):
+    """Return (index of the JSON payload, compact?) or None, without any regex."""
+    # fast path: everything the bot writes starts with the spoiler + prefix
+    if content.startswith(_FAST_PREFIXES):
+        if content.startswith(MODLOG_PREFIX, 2):
+            return 2 + len(MODLOG_PREFIX), False
+        return 2 + len(MODLOG_PREFIX_V2), True
+    # legacy: the prefix may appear anywhere in the content
+    i = content.find(MODLOG_PREFIX)
+    if i >= 0:
+        return i + len(MODLOG_PREFIX), False
+    i = content.find(MODLOG_PREFIX_V2)
+    if i >= 0:
+        return i + len(MODLOG_PREFIX_V2), True
+    return None
+
+def decode_raw(content: str):
+    """Decoded payload (dict or list, keys expanded) or None for non-log / malformed content."""
+    if not content or "__m" not in content:
+        return None
+    found = _find_payload(content)
+    if found is None:
+        return None
+    start, compact = found
+    try:
+        # raw_decode stops at the end of the JSON value: no greedy matching, no slicing copies
+        data, _ = _decoder.raw_decode(content, start)
+    except ValueError:
+        return None
+    if compact:
+        expand = lambda e: {EXPANDED_KEYS.get(k, k): v for k, v in e.items()} if isinstance(e, dict) else e
+        data = [expand(e) for e in data] if isinstance(data, list) else expand(data)
+    return data
+
+def decode(content: str):
+    """Single-entry metadata dict, or None (batch logs are not single entries)."""
+    data = decode_raw(content)
+    return data if isinstance(data, dict) else None
+
+def decode_entries(content: str) -> list:
+    """Every valid entry in the content: one for a normal log, several for a batch log."""
+    data = decode_raw(content)
+    if data is None:
+        return []
+    entries = data if isinstance(data, list) else [data]
+    return [e for e in entries if isinstance(e, dict) and "user" in e and "action" in e]
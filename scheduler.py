@@ -0,0 +1,110 @@
+import asyncio
+import heapq
+import time
+
+import aiohttp
+import discord
+
+import db
+
+# ----------------------------
+# Persistent action scheduler
+# ----------------------------
+# Jobs live in the scheduled_actions table and, while the bot runs, in one in-memory heap ordered
+# by run_at. A single task sleeps until the earliest deadline (or until an earlier job is added),
+# so thousands of pending expirations cost one timer, not one task each.
+
+RETRY_BASE = 30.0    # seconds, doubled per failed attempt
+RETRY_MAX = 3600.0
+CONCURRENCY = 5      # due jobs executed at once (a mass expiry shouldn't flood one REST route)
+
+class Scheduler:
+    def __init__(self, handlers: dict):
+        """`handlers` maps action name -> async callable(job dict)."""
+        self.handlers = handlers
+        self._heap = []   # (run_at, job id)
+        self._jobs = {}   # job id -> job dict; cancelled jobs are dropped here and skipped in the heap
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(CONCURRENCY)
+        self._running = set()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def load(self, shards=None):
+        """Fill the heap from the database (only jobs for guilds on `shards`, see db._shard_filter)."""
+        for job in db.load_scheduled_actions(shards):
+            if job["id"] not in self._jobs:
+                self._push(job)
+        self.loaded = True
+        self._wakeup.set()
+
+    def _push(self, job: dict):
+        self._jobs[job["id"]] = job
+        heapq.heappush(self._heap, (job["run_at"], job["id"]))
+        if self._heap[0][1] == job["id"]:
+            self._wakeup.set()  # new earliest deadline: re-arm the timer
+
+    def schedule(self, guild_id: int, user_id: int, action: str, run_at: float, payload: dict = None) -> dict:
+        job = db.add_scheduled_action(guild_id, user_id, action, run_at, payload)
+        self._push(job)
+        return job
+
+    def cancel(self, guild_id: int, user_id: int, action: str) -> int:
+        ids = db.cancel_scheduled_actions(guild_id, user_id, action)
+        for job_id in ids:
+            self._jobs.pop(job_id, None)
+        return len(ids)
+
+    def _next_deadline(self):
+        # discard heap entries for cancelled or rescheduled jobs
+        while self._heap:
+            run_at, job_id = self._heap[0]
+            job = self._jobs.get(job_id)
+            if job is not None and job["run_at"] == run_at:
+                return run_at
+            heapq.heappop(self._heap)
+        return None
+
+    async def _execute(self, job: dict):
+        async with self._semaphore:
+            handler = self.handlers.get(job["action"])
+            try:
+                if handler is None:
+                    raise LookupError(f"no handler for scheduled action {job['action']!r}")
+                await handler(job)
+            except (discord.NotFound, discord.Forbidden, LookupError) as e:
+                # the target or guild is gone, or we may no longer act on it: retrying won't help
+                print(f"⚠️ Scheduled {job['action']} for {job['user_id']} in guild {job['guild_id']} dropped:", e)
+            except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = min(RETRY_MAX, RETRY_BASE * (2 ** job["attempts"]))
+                job = dict(job, run_at=time.time() + delay, attempts=job["attempts"] + 1)
+                db.reschedule_action(job["id"], job["run_at"], job["attempts"])
+                self._push(job)
+                print(f"⚠️ Scheduled {job['action']} failed (attempt {job['attempts']}), retrying in {delay:.0f}s:", e)
+                return
+            except Exception as e:
+                print(f"⚠️ Scheduled {job['action']} crashed, dropping it:", e)
+            db.delete_scheduled_action(job["id"])
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            deadline = self._next_deadline()
+            now = time.time()
+            if deadline is None or deadline > now:
+                timeout = None if deadline is None else deadline - now
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            while self._next_deadline() is not None and self._heap[0][0] <= now:
+                _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.pop(job_id, None)
+                if job is None:
+                    continue
+                task = asyncio.create_task(self._execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
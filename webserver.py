@@ -1,15 +1,82 @@
-from flask import Flask
-from threading import Thread
+import math
+import os
+import time
 
-app = Flask("")
-@app.route("/")
-def home():
-    return "Discord bot ok"
+from aiohttp import web
 
-def run():
-    app.run(host="0.0.0.0", port=8080)
+# ----------------------------
+# In-loop health / metrics server
+# ----------------------------
+# Runs on the bot's own event loop (no thread, no Flask), so what it reports is the bot's real state.
+HOST = "0.0.0.0"
+PORT = int(os.getenv("PORT", "8080"))
+MAX_HEALTHY_LATENCY = 10.0  # seconds; a heartbeat this slow means the gateway is effectively dead
 
+_started_at = time.time()
+_collectors = []  # callables returning Prometheus text lines
 
-def keep_alive():
-    t = Thread(target=run)
-    t.start()
\ No newline at end of file
+def register_metrics(collector):
+    """Add a callable returning an iterable of Prometheus exposition lines to /metrics."""
+    _collectors.append(collector)
+    return collector
+
+def _gateway_state(bot) -> dict:
+    latency = bot.latency
+    return {
+        "ready": bot.is_ready(),
+        "closed": bot.is_closed(),
+        "latency": latency if math.isfinite(latency) else None,
+        "guilds": len(bot.guilds),
+    }
+
+def _healthy(state: dict) -> bool:
+    return state["ready"] and not state["closed"] and state["latency"] is not None and state["latency"] < MAX_HEALTHY_LATENCY
+
+def create_app(bot) -> web.Application:
+    async def home(request):
+        return web.Response(text="Discord bot ok")
+
+    async def healthz(request):
+        state = _gateway_state(bot)
+        healthy = _healthy(state)
+        body = dict(state, status="ok" if healthy else "unhealthy")
+        if state["latency"] is not None:
+            body["latency_ms"] = round(state["latency"] * 1000, 1)
+        return web.json_response(body, status=200 if healthy else 503)
+
+    async def metrics(request):
+        state = _gateway_state(bot)
+        lines = [
+            "# HELP discord_gateway_up 1 if the gateway is connected and heartbeating.",
+            "# TYPE discord_gateway_up gauge",
+            f"discord_gateway_up {int(_healthy(state))}",
+            "# HELP discord_gateway_latency_seconds Last heartbeat round-trip.",
+            "# TYPE discord_gateway_latency_seconds gauge",
+            f"discord_gateway_latency_seconds {state['latency'] if state['latency'] is not None else 'NaN'}",
+            "# HELP discord_guilds Guilds the bot is in.",
+            "# TYPE discord_guilds gauge",
+            f"discord_guilds {state['guilds']}",
+            "# HELP process_uptime_seconds Seconds since the bot process started.",
+            "# TYPE process_uptime_seconds gauge",
+            f"process_uptime_seconds {time.time() - _started_at:.0f}",
+        ]
+        for collector in _collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print("⚠️ Metrics collector failed:", e)
+        return web.Response(text="\n".join(lines) + "\n", content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/", home)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+async def start(bot, host: str = HOST, port: int = PORT) -> web.AppRunner:
+    """Start serving on the running loop; keep the runner and `await runner.cleanup()` on shutdown."""
+    runner = web.AppRunner(create_app(bot), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"✅ Health server listening on {host}:{port}")
+    return runner